@@ -1,6 +1,7 @@
 import streamlit as st
+import os
 import time
-import random
+import numpy as np
 from pyvis.network import Network
 import streamlit.components.v1 as components
 import pandas as pd
@@ -152,6 +153,7 @@ ALL_COMPANY_NAMES = [
     "Constructo", "MediaGiant", "LogiTrans", "EcoPower", "NanoMed"
 ]
 BANKS = ["Bank A", "Bank B", "Bank C", "Bank D"]
+SIM_SEED = os.getenv("SIM_SEED") # Set to replay the exact same simulation
 NEWS_TEMPLATES = [
     "reports record quarterly growth",
     "announces new merger talks",
@@ -184,25 +186,26 @@ def get_market_sentiment(risk_score):
     if risk_score < 7: return "NERVOUS"
     return "PANIC"
 
-def generate_company_data(name):
-    exposure = random.randint(100, 300) 
+def generate_company_data(name, rng):
+    exposure = int(rng.integers(100, 301))
     return {
         "id": name,
         "name": name,
         "exposure": exposure,
         "margin": round(exposure * 0.10, 2),  
         # FIXED: Collateral is now LESS than debt (80% to 95%) to create Gap Risk
-        "collateral": round(exposure * random.uniform(0.80, 0.95), 2), 
+        "collateral": round(exposure * rng.uniform(0.80, 0.95), 2), 
         "status": "HEALTHY",
-        "news": f"{name} {random.choice(NEWS_TEMPLATES)}",
+        "news": f"{name} {rng.choice(NEWS_TEMPLATES)}",
+        "lender": str(rng.choice(BANKS)),
         "ai_alert": False
     }
 
-def generate_healthy_transaction(active_companies):
+def generate_healthy_transaction(active_companies, rng):
     if not active_companies: return "Market Quiet..."
-    lender = random.choice(BANKS)
-    borrower = random.choice(active_companies)['name']
-    amount = random.randint(20, 100)
+    lender = rng.choice(BANKS)
+    borrower = active_companies[rng.integers(len(active_companies))]['name']
+    amount = rng.integers(20, 101)
     return f"{lender} ➔ {borrower}: ₹{amount} Cr (Settled)"
 
 # ======================================================
@@ -214,11 +217,18 @@ for key, default in [('iteration', 0), ('logs', []), ('show_payoffs', False),
     if key not in st.session_state:
         st.session_state[key] = default
 
+if 'rng' not in st.session_state:
+    # Independent streams for the app loop and the network, both derived from one seed
+    app_seq, network_seq = np.random.SeedSequence(int(SIM_SEED) if SIM_SEED else None).spawn(2)
+    st.session_state.rng = np.random.default_rng(app_seq)
+    st.session_state.network_seed = network_seq
+rng = st.session_state.rng
+
 if 'active_companies' not in st.session_state:
-    st.session_state.active_companies = [generate_company_data(n) for n in random.sample(ALL_COMPANY_NAMES, 4)]
+    st.session_state.active_companies = [generate_company_data(str(n), rng) for n in rng.choice(ALL_COMPANY_NAMES, 4, replace=False)]
 
 if 'network' not in st.session_state:
-    st.session_state.network = NetworkManager()
+    st.session_state.network = NetworkManager(seed=st.session_state.network_seed)
     st.session_state.ccp = CCP()
 
 # ======================================================
@@ -230,26 +240,26 @@ if st.session_state.is_playing:
     # 1. Shuffle Companies (Every 3 ticks)
     if st.session_state.iteration % 3 == 0:
         st.session_state.active_companies.pop(0)
-        new_name = random.choice([n for n in ALL_COMPANY_NAMES if n not in [c['name'] for c in st.session_state.active_companies]])
-        st.session_state.active_companies.append(generate_company_data(new_name))
+        new_name = str(rng.choice([n for n in ALL_COMPANY_NAMES if n not in [c['name'] for c in st.session_state.active_companies]]))
+        st.session_state.active_companies.append(generate_company_data(new_name, rng))
         st.session_state.logs.insert(0, f"MARKET UPDATE: {new_name} entered the market.")
 
     # 2. Transactions
     for _ in range(2): 
-        txn = generate_healthy_transaction(st.session_state.active_companies)
+        txn = generate_healthy_transaction(st.session_state.active_companies, rng)
         st.session_state.logs.insert(0, txn)
     st.session_state.logs = st.session_state.logs[:10]
 
     # 3. AI Risk Scan
-    if random.random() < 0.05:
-        target = random.choice(st.session_state.active_companies)
+    if rng.random() < 0.05:
+        target = st.session_state.active_companies[rng.integers(len(st.session_state.active_companies))]
         ai_result = predictor.get_ai_risk_assessment()
         
         target['status'] = "RISK DETECTED"
         target['ai_alert'] = True
         target['margin'] = round(target['exposure'] * (ai_result['recommended_margin']/100), 2)
         # Squeeze collateral to create gap risk
-        target['collateral'] = round(target['exposure'] * random.uniform(0.7, 0.8), 2)
+        target['collateral'] = round(target['exposure'] * rng.uniform(0.7, 0.8), 2)
         target['news'] = f"BREAKING: {target['name']} CFO resigns amid scandal!"
         
         st.session_state.is_playing = False
@@ -321,7 +331,7 @@ with col_graph:
     for comp in st.session_state.active_companies:
         color = "#b23a48" if "DEFAULT" in comp['status'] else ("#4f5d75" if comp['ai_alert'] else "#27AE60")
         net.add_node(comp['id'], color=color, size=18, label=comp['name'])
-        net.add_edge(random.choice(BANKS), comp['id'])
+        net.add_edge(comp.get('lender', BANKS[0]), comp['id'])
     
     try:
         net.save_graph('net.html')
@@ -369,7 +379,7 @@ with col_monitor:
                 if st.button(f"Trigger Crash ({comp['name']})", key=f"crash_{i}", type="primary"):
                     comp['status'] = "DEFAULTED"
                     comp['news'] = "CRITICAL: Default triggered."
-                    comp['collateral'] = round(comp['exposure'] * random.uniform(0.6, 0.8), 2)
+                    comp['collateral'] = round(comp['exposure'] * rng.uniform(0.6, 0.8), 2)
                     # IMMEDIATELY UPDATE RISK SCORE
                     st.session_state.risk_score = calculate_risk_score(st.session_state.active_companies, st.session_state.ccp_stress)
                     st.session_state.global_margin = calculate_global_margin(st.session_state.risk_score)
@@ -487,7 +497,7 @@ if st.session_state.show_ccp_funds:
         st.markdown("#### 📋 Intervention History")
         
         allotment_rows = ""
-        for i, event in enumerate(reversed(ccp.allotment_log[-10:])):  # Show last 10 events
+        for i, event in enumerate(reversed(ccp.allotment_log.tail(10))):  # Show last 10 events
             status_color = "#27AE60" if event['status'] == 'Fully Protected' else "#f4a261"
             allotment_rows += f"<tr><td><b>#{len(ccp.allotment_log) - i}</b></td><td>{event['failed_bank']}</td><td>{event['target_bank']}</td><td style='font-weight:800; color:#adc178;'>${event['allotment']:,.2f}M</td><td><span class='status-badge' style='background:{status_color}; color:white;'>{event['status']}</span></td></tr>"
         
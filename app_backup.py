@@ -10,8 +10,8 @@ from src.news_analyzer import NewsAnalyzer
 from src.predictor import PricePredictor
 from src.network_manager import NetworkManager
 from src.ccp import CCP
+from src.snapshot import Checkpointer
 import os 
-import random
 import re
 
 st.set_page_config(layout="wide", page_title="Financial Stability Dashboard")
@@ -470,9 +470,24 @@ if 'round' not in st.session_state:
     st.session_state.is_playing = False 
     st.session_state.show_details = False 
     st.session_state.history = []
-    st.session_state.network = NetworkManager()
+    # Independent streams for the app loop and the network, both derived from one seed
+    sim_seed = os.getenv("SIM_SEED")
+    app_seq, network_seq = np.random.SeedSequence(int(sim_seed) if sim_seed else None).spawn(2)
+    st.session_state.rng = np.random.default_rng(app_seq)
+    st.session_state.network = NetworkManager(seed=network_seq)
     st.session_state.ccp = CCP()
-    st.session_state.data_engine = DataEngine()
+    # Layered default waterfall: IM on 10% of capital cleared, DF contributions at 0.5% of capital
+    members = list(st.session_state.network.G.nodes)
+    capital = np.array([st.session_state.network.G.nodes[m]['capital'] for m in members])
+    st.session_state.ccp.setup_waterfall(
+        members,
+        initial_margin=st.session_state.ccp.calculate_margins(10, 0.0, capital * 0.10),
+        default_fund=capital * 0.005
+    )
+    # Bounded history: each snapshot carries the growing novation legs, so keep the last 50 rounds
+    st.session_state.checkpoints = Checkpointer(max_checkpoints=50)
+    st.session_state.checkpoints.save(0, st.session_state.network, st.session_state.ccp, st.session_state.rng)
+    st.session_state.data_engine = DataEngine(offline=os.getenv("DATA_OFFLINE") == "1")
     st.session_state.news_analyzer = NewsAnalyzer()
     st.session_state.predictor = PricePredictor()
     st.session_state.last_intervention = None 
@@ -529,20 +544,44 @@ with st.sidebar:
 
     # Risk Management Section
     st.markdown('<div class="sidebar-section-title" style="margin-top:20px;">Risk Management</div>', unsafe_allow_html=True)
+    # DebtRank is cached on the NetworkManager and only recomputed after failures or wealth changes
+    debtrank = st.session_state.network.metrics.get('debtrank')
     major_banks = [n for n, d in st.session_state.network.G.nodes(data=True) if d['type'] == 'hub']
-    target_bank = st.selectbox("Select Bank to Fail", major_banks)
+    major_banks.sort(key=lambda bank: debtrank[bank], reverse=True) # Most damaging failure first
+    target_bank = st.selectbox("Select Bank to Fail", major_banks, format_func=lambda bank: f"{bank} (DebtRank {debtrank[bank]:.3f})")
+
+    importance = st.session_state.network.metrics.ranking('debtrank', top=5)
+    st.dataframe(pd.DataFrame(importance, columns=['Bank', 'DebtRank']), hide_index=True)
+
+    # Netting savings only change with the topology, so reruns read the cached result
+    netting = st.session_state.network.netting.summary()
+    st.metric("CCP Netting Savings", f"{netting['multilateral_savings']:.1%}",
+              f"Bilateral only: {netting['bilateral_savings']:.1%}", delta_color="off")
+
+    with st.expander("What-if: Hub Failure Sweep"):
+        # The sweep only changes with the graph or bank state, so reruns reuse the last result
+        network = st.session_state.network
+        sweep_key = (network.topology_version, network.state_version)
+        cached_sweep = st.session_state.get('what_if_sweep')
+        if cached_sweep is None or cached_sweep[0] != sweep_key or cached_sweep[1] is not network:
+            st.session_state.what_if_sweep = (sweep_key, network, network.what_if('hubs', ccp=st.session_state.ccp))
+        sweep = st.session_state.what_if_sweep[2]
+        st.dataframe(sweep[['bank', 'total_loss', 'failures', 'ccp_drawdown']].rename(columns={
+            'bank': 'Bank', 'total_loss': 'Total Loss ($M)', 'failures': 'Failures', 'ccp_drawdown': 'CCP Drawdown ($M)'
+        }), hide_index=True)
     
     if st.button("Trigger Bank Failure"):
         if target_bank:
             st.session_state.is_playing = False 
             st.session_state.round += 1
             st.session_state.network.fail_node(target_bank)
-            impacted_banks, intervention = st.session_state.network.update_contagion(ccp=st.session_state.ccp)
+            cascade = st.session_state.network.run_cascade(ccp=st.session_state.ccp)
+            impacted_banks, intervention = cascade['impacted'], cascade['intervention']
             st.session_state.last_intervention = intervention
             st.session_state.show_details = True # AUTO-OPEN ON FAILURE
             
             headlines = st.session_state.news_analyzer.fetch_headlines()
-            market_headline = random.choice(headlines) if headlines else "Global markets watch volatility closely."
+            market_headline = headlines[st.session_state.rng.integers(len(headlines))] if headlines else "Global markets watch volatility closely."
             shock_headline = f"BREAKING: {target_bank} has officially entered Bankruptcy proceedings."
             analysis = st.session_state.news_analyzer.analyze_risk(shock_headline)
             margin = st.session_state.ccp.calculate_margin(analysis['health_score'], -0.25)
@@ -561,10 +600,24 @@ with st.sidebar:
                 'impacted_banks': impacted_banks,
                 'system_health': np.mean([data['wealth'] for n, data in st.session_state.network.G.nodes(data=True)])
             })
+            st.session_state.checkpoints.save(st.session_state.round, st.session_state.network, st.session_state.ccp, st.session_state.rng)
             st.toast(f"{target_bank} HAS FAILED")
         else:
             st.warning("Please select a bank to trigger failure.")
 
+    # --- Replay / Branch from a checkpoint ---
+    saved_rounds = st.session_state.checkpoints.rounds()
+    if len(saved_rounds) > 1:
+        rewind_round = st.selectbox("Rewind to Round", saved_rounds, index=len(saved_rounds) - 1)
+        if st.button("Restore Round"):
+            st.session_state.is_playing = False
+            st.session_state.network, st.session_state.ccp = st.session_state.checkpoints.restore(rewind_round, st.session_state.rng)
+            st.session_state.ccp.set_mode(st.session_state.ai_enabled)
+            st.session_state.checkpoints.truncate(rewind_round)
+            st.session_state.history = [h for h in st.session_state.history if h['round'] <= rewind_round]
+            st.session_state.round = rewind_round
+            st.rerun()
+
     # --- View More Insights (Persistent Section) ---
     if st.session_state.last_intervention:
         st.markdown('<div class="sidebar-section-title" style="margin-top:20px;">System Analysis</div>', unsafe_allow_html=True)
@@ -598,14 +651,14 @@ with st.sidebar:
         # 1. Prediction (ML Model)
         last_30_days = st.session_state.market_data.values[-30:]
         prediction = st.session_state.predictor.predict(last_30_days)
-        actual_price = last_30_days[-1] * (1 + np.random.normal(0, 0.012)) 
+        actual_price = last_30_days[-1] * (1 + st.session_state.rng.normal(0, 0.012)) 
         
         new_date = st.session_state.market_data.index[-1] + pd.Timedelta(days=1)
         st.session_state.market_data[new_date] = actual_price
         
         # 2. Fetch News & Analyze
         headlines = st.session_state.news_analyzer.fetch_headlines()
-        selected_headline = random.choice(headlines) if headlines else "Market activity remains stable under CCP oversight."
+        selected_headline = headlines[st.session_state.rng.integers(len(headlines))] if headlines else "Market activity remains stable under CCP oversight."
         analysis = st.session_state.news_analyzer.analyze_risk(selected_headline)
         
         # 3. Update CCP & Novation
@@ -614,18 +667,25 @@ with st.sidebar:
         margin = st.session_state.ccp.calculate_margin(analysis['health_score'], price_change)
         
         # CCP handles random transaction volume
-        trade_volume = random.randint(30, 150)
-        st.session_state.ccp.perform_novation(num_trades=trade_volume)
+        trade_volume = int(st.session_state.rng.integers(30, 151))
+        banks = np.array(list(st.session_state.network.G.nodes))
+        st.session_state.ccp.perform_novation(
+            buyers=banks[st.session_state.rng.integers(len(banks), size=trade_volume)],
+            sellers=banks[st.session_state.rng.integers(len(banks), size=trade_volume)],
+            notionals=st.session_state.rng.lognormal(3, 1, size=trade_volume),
+            instruments=st.session_state.rng.choice(['IRS', 'FX Forward', 'CDS'], size=trade_volume)
+        )
         
         # 4. Update Network & Contagion
         G = st.session_state.network.G
-        impacted_banks, intervention = st.session_state.network.update_contagion(ccp=st.session_state.ccp)
+        # Only failures that have not propagated yet hit their neighbours
+        cascade = st.session_state.network.run_cascade(ccp=st.session_state.ccp)
+        impacted_banks, intervention = cascade['impacted'], cascade['intervention']
         if intervention:
             st.session_state.last_intervention = intervention
             
-        for node in G.nodes():
-            if G.nodes[node]['status'] != 'failed':
-                G.nodes[node]['wealth'] *= (1 + np.random.normal(0, 0.015))
+        shocks = 1 + st.session_state.rng.normal(0, 0.015, size=G.number_of_nodes())
+        st.session_state.network.apply_wealth_shocks(shocks)
         
         # 5. Update History
         st.session_state.history.append({
@@ -642,6 +702,7 @@ with st.sidebar:
             'intervention': intervention,
             'system_health': np.mean([data['wealth'] for n, data in G.nodes(data=True)])
         })
+        st.session_state.checkpoints.save(st.session_state.round, st.session_state.network, st.session_state.ccp, st.session_state.rng)
         
         if st.session_state.is_playing:
             import time
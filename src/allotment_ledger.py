@@ -0,0 +1,222 @@
+import numpy as np
+import os
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STATUSES = ['Fully Protected', 'Partially Absorbed']
+
+
+class AllotmentLedger:
+    """
+    Append-only columnar store for CCP allotment events.
+    Events live in preallocated column arrays (interned bank ids, allotment, status code,
+    sequence number). Retention:
+    - capacity=None: keep everything, columns grow by doubling
+    - capacity=N: ring buffer of the last N events; evicted rows are dropped, or written
+      to spill_dir as .npz blocks when one is given
+    Per-bank totals (allotted per failed bank / per protected bank) are running sums over
+    every event ever recorded, so they stay exact after eviction.
+    """
+
+    def __init__(self, capacity=10_000, spill_dir=None, spill_block=None):
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        self.spill_block = spill_block or capacity or 0
+        size = capacity or 1024
+        self.target = np.zeros(size, dtype=np.int32)
+        self.failed = np.zeros(size, dtype=np.int32)
+        self.allotment = np.zeros(size, dtype=np.float64)
+        self.status = np.zeros(size, dtype=np.uint8)
+        self.seq = np.zeros(size, dtype=np.int64)
+        self.count = 0 # Events ever recorded
+        self.filled = 0 # Rows currently retained
+        self.cursor = 0 # Next row to write
+        self.names = []
+        self.name_index = {}
+        self.statuses = list(STATUSES)
+        self.total_by_failed = np.zeros(64)
+        self.total_by_target = np.zeros(64)
+        self.spilled = 0
+        self._pending = [] # Evicted blocks waiting to be spilled
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.tail(self.filled))
+
+    def intern(self, names):
+        """Interned ids for bank names, registering new names as they appear."""
+        index = self.name_index
+        for name in names:
+            if name not in index:
+                index[name] = len(self.names)
+                self.names.append(name)
+        if len(self.names) > len(self.total_by_failed):
+            grow = max(len(self.names), 2 * len(self.total_by_failed)) - len(self.total_by_failed)
+            self.total_by_failed = np.concatenate((self.total_by_failed, np.zeros(grow)))
+            self.total_by_target = np.concatenate((self.total_by_target, np.zeros(grow)))
+        return np.array([index[name] for name in names], dtype=np.int32)
+
+    def _status_codes(self, statuses):
+        for status in statuses:
+            if status not in self.statuses:
+                self.statuses.append(status)
+        return np.array([self.statuses.index(s) for s in statuses], dtype=np.uint8)
+
+    def append(self, event):
+        """Records one event dict (target_bank, failed_bank, allotment, status)."""
+        self.extend(event['failed_bank'], [event['target_bank']], [event['allotment']], [event['status']])
+
+    def extend(self, failed_bank, target_banks, allotments, statuses):
+        """Records a batch of events for one failed bank; allotments/statuses align with target_banks."""
+        k = len(target_banks)
+        if k == 0:
+            return
+        targets = self.intern(target_banks)
+        failed = self.intern([failed_bank])[0]
+        allotments = np.asarray(allotments, dtype=np.float64)
+        codes = self._status_codes(statuses)
+
+        np.add.at(self.total_by_target, targets, allotments)
+        self.total_by_failed[failed] += allotments.sum()
+
+        if self.capacity is None:
+            self._reserve(self.filled + k)
+            self.cursor = self.filled
+        elif k > self.capacity:
+            # Only the newest `capacity` rows can be retained: the whole buffer is evicted and
+            # the overflow goes straight to the spill after it
+            if self.spill_dir:
+                retained = self._rows(self.filled)
+                self._pending.append(self._block(self.failed[retained], self.target[retained], self.allotment[retained],
+                                                 self.status[retained], self.seq[retained]))
+                self._pending.append(self._block(np.full(k - self.capacity, failed), targets[:-self.capacity],
+                                                 allotments[:-self.capacity], codes[:-self.capacity],
+                                                 np.arange(self.count, self.count + k - self.capacity)))
+            self.count += k - self.capacity
+            self.filled = 0
+            targets, allotments, codes = targets[-self.capacity:], allotments[-self.capacity:], codes[-self.capacity:]
+            k = self.capacity
+
+        if self.capacity is not None:
+            # The oldest retained rows are the ones this batch overwrites (not the free slots at cursor)
+            evicted = self._rows(self.filled)[:max(0, self.filled + k - self.capacity)]
+            if evicted.size and self.spill_dir:
+                self._pending.append(self._block(self.failed[evicted], self.target[evicted], self.allotment[evicted],
+                                                 self.status[evicted], self.seq[evicted]))
+            self.filled = min(self.filled + k, self.capacity)
+        else:
+            self.filled += k
+
+        rows = (self.cursor + np.arange(k)) % len(self.seq)
+        self.target[rows] = targets
+        self.failed[rows] = failed
+        self.allotment[rows] = allotments
+        self.status[rows] = codes
+        self.seq[rows] = np.arange(self.count, self.count + k)
+        self.count += k
+        self.cursor = (self.cursor + k) % len(self.seq)
+
+        if self._pending and sum(len(b['seq']) for b in self._pending) >= self.spill_block:
+            self.flush()
+
+    def _reserve(self, size):
+        if size <= len(self.seq):
+            return
+        size = max(size, 2 * len(self.seq))
+        for column in ('target', 'failed', 'allotment', 'status', 'seq'):
+            old = getattr(self, column)
+            new = np.zeros(size, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, column, new)
+
+    @staticmethod
+    def _block(failed, target, allotment, status, seq):
+        return {'failed': np.array(failed), 'target': np.array(target), 'allotment': np.array(allotment),
+                'status': np.array(status), 'seq': np.array(seq)}
+
+    def flush(self):
+        """Writes evicted rows waiting in memory to spill_dir as one .npz block."""
+        if not self._pending or not self.spill_dir:
+            return
+        block = {column: np.concatenate([b[column] for b in self._pending]) for column in self._pending[0]}
+        path = os.path.join(self.spill_dir, f"ledger_{block['seq'][0]:012d}.npz")
+        np.savez(path, names=np.array(self.names, dtype=str), statuses=np.array(self.statuses, dtype=str), **block)
+        self.spilled += len(block['seq'])
+        self._pending = []
+        logger.debug(f"Ledger: spilled {len(block['seq'])} events to {path}.")
+
+    def _rows(self, k):
+        """Row positions of the newest k retained events, oldest first."""
+        k = min(k, self.filled)
+        return (self.cursor - k + np.arange(k)) % len(self.seq)
+
+    def tail(self, k=10):
+        """Newest k events as dicts, oldest first. O(k) regardless of ledger size."""
+        rows = self._rows(k)
+        return [
+            {'target_bank': self.names[t], 'failed_bank': self.names[f], 'allotment': a, 'status': self.statuses[s]}
+            for t, f, a, s in zip(self.target[rows].tolist(), self.failed[rows].tolist(),
+                                  self.allotment[rows].tolist(), self.status[rows].tolist())
+        ]
+
+    def totals_by_failed(self):
+        """{failed bank: total allotted on its behalf} over every event recorded."""
+        return {name: float(self.total_by_failed[i]) for i, name in enumerate(self.names) if self.total_by_failed[i]}
+
+    def totals_by_target(self):
+        """{protected bank: total allotted to it} over every event recorded."""
+        return {name: float(self.total_by_target[i]) for i, name in enumerate(self.names) if self.total_by_target[i]}
+
+    def to_arrays(self):
+        """Retained events in age order plus the interned tables and running totals."""
+        rows = self._rows(self.filled)
+        return {
+            'log_names': np.array(self.names, dtype=str),
+            'log_statuses': np.array(self.statuses, dtype=str),
+            'log_target': self.target[rows],
+            'log_failed': self.failed[rows],
+            'log_allotment': self.allotment[rows],
+            'log_status': self.status[rows],
+            'log_seq': self.seq[rows],
+            'log_total_by_failed': self.total_by_failed[:len(self.names)],
+            'log_total_by_target': self.total_by_target[:len(self.names)],
+            'log_params': np.array([self.count, -1 if self.capacity is None else self.capacity, self.spilled])
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, spill_dir=None):
+        count, capacity, spilled = arrays['log_params'].tolist()
+        ledger = cls(capacity=None if capacity < 0 else capacity, spill_dir=spill_dir)
+        ledger.intern(arrays['log_names'].tolist())
+        ledger.statuses = arrays['log_statuses'].tolist()
+        k = len(arrays['log_seq'])
+        ledger._reserve(k)
+        for column in ('target', 'failed', 'allotment', 'status', 'seq'):
+            getattr(ledger, column)[:k] = arrays[f'log_{column}']
+        ledger.filled = k
+        ledger.cursor = k % len(ledger.seq)
+        ledger.count = count
+        ledger.spilled = spilled
+        ledger.total_by_failed[:len(ledger.names)] = arrays['log_total_by_failed']
+        ledger.total_by_target[:len(ledger.names)] = arrays['log_total_by_target']
+        return ledger
+
+    @staticmethod
+    def read_spill(spill_dir):
+        """Loads every spilled block in spill_dir, oldest first, as one list of event dicts."""
+        events = []
+        for file in sorted(f for f in os.listdir(spill_dir) if f.startswith('ledger_') and f.endswith('.npz')):
+            with np.load(os.path.join(spill_dir, file), allow_pickle=False) as block:
+                names, statuses = block['names'].tolist(), block['statuses'].tolist()
+                events.extend(
+                    {'target_bank': names[t], 'failed_bank': names[f], 'allotment': a, 'status': statuses[s]}
+                    for t, f, a, s in zip(block['target'].tolist(), block['failed'].tolist(),
+                                          block['allotment'].tolist(), block['status'].tolist())
+                )
+        return events
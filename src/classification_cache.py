@@ -0,0 +1,114 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def normalize_headline(headline):
+    """Case- and whitespace-insensitive form of a headline, so trivial variants share a key."""
+    return re.sub(r'\s+', ' ', headline).strip().lower()
+
+
+class ClassificationCache:
+    """
+    Content-addressed cache of headline classifications.
+    Keys are SHA-256 digests of (normalized headline, model, prompt version), so a new model
+    or prompt never serves stale verdicts. Lookups hit an in-memory LRU first and fall back
+    to a SQLite file that survives restarts; entries older than ttl seconds are expired.
+    The normalized headline is stored next to each verdict, so the cached model labels
+    double as training data (see labelled). path=None keeps the cache in memory only.
+    """
+
+    def __init__(self, path=None, capacity=1024, ttl=7 * 24 * 3600):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._memory = OrderedDict() # key -> (created, verdict)
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0, 'writes': 0}
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS classifications (key TEXT PRIMARY KEY, verdict TEXT, created REAL, headline TEXT)")
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(classifications)")]
+        if 'headline' not in columns: # Cache files written before headlines were kept
+            self.db.execute("ALTER TABLE classifications ADD COLUMN headline TEXT")
+        self.db.commit()
+
+    @staticmethod
+    def key(headline, model, prompt_version):
+        raw = "\x1f".join((normalize_headline(headline), model, str(prompt_version)))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _remember(self, key, created, verdict):
+        self._memory[key] = (created, verdict)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Cached verdict for key, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return dict(entry[1])
+                del self._memory[key]
+
+            row = self.db.execute("SELECT verdict, created FROM classifications WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            verdict, created = json.loads(row[0]), row[1]
+            if now - created > self.ttl:
+                self.db.execute("DELETE FROM classifications WHERE key = ?", (key,))
+                self.db.commit()
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._remember(key, created, verdict)
+            self.stats['disk_hits'] += 1
+            return dict(verdict)
+
+    def put(self, key, verdict, headline=None):
+        now = time.time()
+        headline = normalize_headline(headline) if headline is not None else None
+        with self._lock:
+            self._remember(key, now, dict(verdict))
+            self.db.execute("INSERT OR REPLACE INTO classifications (key, verdict, created, headline) VALUES (?, ?, ?, ?)",
+                            (key, json.dumps(verdict), now, headline))
+            self.db.commit()
+            self.stats['writes'] += 1
+
+    def labelled(self):
+        """Unexpired (normalized headline, verdict) pairs, oldest first, for training a local classifier."""
+        with self._lock:
+            rows = self.db.execute("SELECT headline, verdict FROM classifications WHERE headline IS NOT NULL AND created >= ? "
+                                   "ORDER BY created", (time.time() - self.ttl,)).fetchall()
+        return [(headline, json.loads(verdict)) for headline, verdict in rows]
+
+    def purge_expired(self):
+        """Deletes expired rows from disk; returns how many were removed."""
+        with self._lock:
+            cursor = self.db.execute("DELETE FROM classifications WHERE created < ?", (time.time() - self.ttl,))
+            self.db.commit()
+            return cursor.rowcount
+
+    def hit_rate(self):
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
@@ -0,0 +1,143 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import bicgstab
+import time
+import logging
+
+from src.contagion_engine import ContagionEngine
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ClearingSolver:
+    """
+    Eisenberg-Noe clearing-payment solver with Rogers-Veraart default costs.
+    Bank i owes L[i, j] to bank j and holds external assets e[i]. The clearing vector p
+    is the greatest fixed point of
+        p_i = pbar_i                                   if e_i + (Pi^T p)_i >= pbar_i
+        p_i = alpha * e_i + beta * (Pi^T p)_i          otherwise
+    where pbar = L @ 1 and Pi = L / pbar. alpha = beta = 1 is the plain Eisenberg-Noe model.
+    """
+
+    def __init__(self, liabilities, external_assets, names=None, alpha=1.0, beta=1.0, tol=1e-9, max_iter=1000):
+        self.L = sp.csr_matrix(liabilities, dtype=np.float64)
+        self.e = np.asarray(external_assets, dtype=np.float64)
+        self.names = list(names) if names is not None else list(range(self.L.shape[0]))
+        self.alpha = alpha
+        self.beta = beta
+        self.tol = tol
+        self.max_iter = max_iter
+
+        self.pbar = np.asarray(self.L.sum(axis=1)).ravel()
+        inv_pbar = np.divide(1.0, self.pbar, out=np.zeros_like(self.pbar), where=self.pbar > 0)
+        self.Pi_T = (sp.diags(inv_pbar) @ self.L).T.tocsr() # Relative liabilities, transposed for inflows
+
+    @classmethod
+    def from_graph(cls, G, exposure_ratio=0.5, **kwargs):
+        """
+        Builds the liabilities matrix from the edge weights of a NetworkManager graph.
+        Each bank owes exposure_ratio of its starting capital to its counterparties,
+        split in proportion to the edge weights. Current wealth is used as external
+        assets, so failed banks (wealth 0) can only pass on what they receive.
+        """
+        return cls.from_engine(ContagionEngine.from_graph(G), exposure_ratio=exposure_ratio, **kwargs)
+
+    @classmethod
+    def from_engine(cls, engine, exposure_ratio=0.5, **kwargs):
+        """Same liability model as from_graph, built straight from a compiled ContagionEngine."""
+        n = len(engine.names)
+        rows = np.repeat(np.arange(n), np.diff(engine.indptr))
+        row_weight = np.bincount(rows, weights=engine.weights, minlength=n)
+        scale = np.divide(exposure_ratio * engine.capital, row_weight, out=np.zeros(n), where=row_weight > 0)
+        L = sp.csr_matrix((engine.weights * scale[rows], engine.indices, engine.indptr), shape=(n, n))
+
+        return cls(L, engine.wealth, names=engine.names, **kwargs)
+
+    def _update(self, p):
+        """One application of the clearing map; returns the new vector and the default mask."""
+        inflows = self.Pi_T @ p
+        defaulted = self.e + inflows < self.pbar
+        p_new = np.where(defaulted, self.alpha * self.e + self.beta * inflows, self.pbar)
+        return np.clip(p_new, 0, self.pbar), defaulted
+
+    def _picard(self):
+        """Monotone fixed-point iteration started from full payment."""
+        p = self.pbar.copy()
+        defaulted = np.zeros(len(p), dtype=bool)
+        for iteration in range(1, self.max_iter + 1):
+            p_new, defaulted = self._update(p)
+            delta = np.max(np.abs(p_new - p)) if p.size else 0.0
+            p = p_new
+            if delta <= self.tol:
+                return p, defaulted, iteration, True
+        return p, defaulted, self.max_iter, False
+
+    def _fictitious_default(self):
+        """
+        Fictitious default algorithm: grow the default set and solve the linear system
+        for defaulters at each step. Terminates in at most n + 2 rounds (n + 1 that can
+        grow the set, one to confirm it). Each solve is an iterative BiCGSTAB warm-started
+        from the previous round's payments, so later rounds only correct the last change
+        instead of refactorising the whole defaulter block.
+        """
+        n = len(self.pbar)
+        p = self.pbar.copy()
+        defaulted = np.zeros(n, dtype=bool)
+        for iteration in range(1, min(self.max_iter, n + 2) + 1):
+            new_defaulted = defaulted | (self.e + self.Pi_T @ p < self.pbar - self.tol)
+            if iteration > 1 and np.array_equal(new_defaulted, defaulted):
+                return p, defaulted, iteration, True
+            defaulted = new_defaulted
+
+            d = np.flatnonzero(defaulted)
+            if d.size == 0:
+                continue
+            s = np.flatnonzero(~defaulted)
+            # (I - beta * Pi_DD^T) p_D = alpha * e_D + beta * Pi_SD^T pbar_S
+            Pi_T_d = self.Pi_T[d]
+            A = sp.identity(d.size, format='csc') - self.beta * Pi_T_d[:, d].tocsc()
+            rhs = self.alpha * self.e[d] + self.beta * (Pi_T_d[:, s] @ self.pbar[s])
+            p_d, info = bicgstab(A, rhs, x0=p[d], rtol=0.0, atol=self.tol * np.sqrt(d.size), maxiter=self.max_iter)
+            if info != 0 or not np.all(np.isfinite(p_d)):
+                logger.warning("Clearing: default system did not solve, falling back to Picard iteration.")
+                return self._picard()
+
+            p = self.pbar.copy()
+            p[d] = np.clip(p_d, 0, self.pbar[d])
+        return p, defaulted, self.max_iter, False
+
+    def solve(self, method="fictitious_default"):
+        """
+        Computes the clearing vector.
+        method is "fictitious_default" (exact default set, few warm-started sparse solves) or "picard" (matrix-vector iteration).
+        """
+        start = time.perf_counter()
+        if method == "picard":
+            p, defaulted, iterations, converged = self._picard()
+        elif method == "fictitious_default":
+            p, defaulted, iterations, converged = self._fictitious_default()
+        else:
+            raise ValueError(f"Unknown clearing method: {method}")
+        wall_time = time.perf_counter() - start
+
+        if not converged:
+            logger.warning(f"Clearing: {method} did not converge within {self.max_iter} iterations.")
+
+        shortfall = self.pbar - p
+        creditor_loss = self.Pi_T @ shortfall
+        equity = self.e + self.Pi_T @ p - self.pbar
+        logger.info(f"Clearing: {int(defaulted.sum())} defaults, {iterations} iterations in {wall_time*1000:.1f}ms.")
+
+        return {
+            'payments': p,
+            'defaulted': defaulted,
+            'shortfall': shortfall,
+            'creditor_loss': creditor_loss,
+            'equity': equity,
+            'total_shortfall': float(shortfall.sum()),
+            'iterations': iterations,
+            'converged': converged,
+            'wall_time': wall_time,
+            'method': method
+        }
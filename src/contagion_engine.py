@@ -0,0 +1,214 @@
+import numpy as np
+import copy
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Node status codes used by the array engine
+HEALTHY = 0
+STRESSED = 1
+FAILED = 2
+
+STATUS_NAMES = np.array(['healthy', 'stressed', 'failed'], dtype=object)
+STATUS_COLORS = np.array(['green', 'orange', 'red'], dtype=object)
+
+CONTAGION_FACTOR = 0.3    # Share of wealth a neighbour loses per failed counterparty
+MIN_HIT = 1               # Hits at or below this are ignored
+FAILURE_THRESHOLD = 300   # Wealth below this triggers a secondary failure
+
+
+class ContagionEngine:
+    """
+    Array-backed version of NetworkManager.update_contagion.
+    The graph is compiled once into a CSR adjacency (indptr/indices/weights)
+    plus flat wealth and status arrays, so a round touches NumPy slices
+    instead of NetworkX attribute dicts.
+    """
+
+    def __init__(self, names, indptr, indices, weights, wealth, status, node_type=None, capital=None):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.wealth = wealth
+        self.status = status
+        self.node_type = node_type
+        self.capital = capital if capital is not None else wealth.copy() # Starting balance-sheet size
+        self.spent = np.zeros(len(self.names), dtype=bool)  # Failed nodes that already propagated
+
+    @classmethod
+    def from_graph(cls, G):
+        """
+        Compiles a NetworkX graph into CSR form.
+        Node order follows G.nodes and neighbour order follows G.adj so that
+        failures and CCP allotments are processed in the same order as the dict engine.
+        """
+        names = list(G.nodes)
+        index = {name: i for i, name in enumerate(names)}
+        n = len(names)
+
+        degrees = np.fromiter((len(G.adj[name]) for name in names), dtype=np.int64, count=n)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+
+        indices = np.empty(indptr[-1], dtype=np.int64)
+        weights = np.empty(indptr[-1], dtype=np.float64)
+        for i, name in enumerate(names):
+            start = indptr[i]
+            for k, (nbr, attrs) in enumerate(G.adj[name].items()):
+                indices[start + k] = index[nbr]
+                weights[start + k] = attrs.get('weight', 1.0)
+
+        wealth = np.fromiter((G.nodes[name]['wealth'] for name in names), dtype=np.float64, count=n)
+        codes = {'healthy': HEALTHY, 'stressed': STRESSED, 'failed': FAILED}
+        status = np.fromiter((codes[G.nodes[name]['status']] for name in names), dtype=np.int8, count=n)
+        node_type = np.array([G.nodes[name].get('type', '') for name in names], dtype=object)
+        capital = np.fromiter((G.nodes[name].get('capital', G.nodes[name]['wealth']) for name in names), dtype=np.float64, count=n)
+
+        return cls(names, indptr, indices, weights, wealth, status, node_type, capital)
+
+    def fork(self):
+        """
+        Copy-on-write snapshot for what-if runs: the CSR topology and capital arrays are
+        shared read-only, only the mutable wealth/status/spent arrays are copied.
+        """
+        clone = copy.copy(self)
+        clone.wealth = self.wealth.copy()
+        clone.status = self.status.copy()
+        clone.spent = self.spent.copy()
+        return clone
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def fail_node(self, node_name):
+        """Array equivalent of NetworkManager.fail_node."""
+        i = self.index.get(node_name)
+        if i is None:
+            return False
+        self.status[i] = FAILED
+        self.wealth[i] = 0
+        return True
+
+    def _absorb(self, ccp, failed_idx, targets, losses):
+        """
+        Routes a batch of neighbour hits through the CCP and returns what is left to apply.
+        """
+        report = ccp.process_failures_array(
+            self.names[failed_idx],
+            [self.names[t] for t in targets],
+            losses
+        )
+        return losses - report['coverage'], report
+
+    def _propagate(self, sources, ccp=None):
+        """
+        Delivers the hits of each failed source to its surviving neighbours, in order.
+        Returns (impacted indices, newly failed indices, wave totals, last intervention report).
+        """
+        impacted = []
+        new_failures = []
+        intervention_report = None
+        loss = 0.0
+        absorbed = 0.0
+
+        for failed_idx in sources:
+            neighbors = self.neighbors(failed_idx)
+            if neighbors.size == 0:
+                continue
+
+            targets = neighbors[self.status[neighbors] != FAILED]
+            if targets.size == 0:
+                continue
+
+            hits = self.wealth[targets] * CONTAGION_FACTOR
+            if ccp:
+                hits, intervention_report = self._absorb(ccp, failed_idx, targets, hits)
+                absorbed += intervention_report['absorbed']
+
+            hit_mask = hits > MIN_HIT
+            targets = targets[hit_mask]
+            self.wealth[targets] -= hits[hit_mask]
+            self.status[targets] = STRESSED
+            impacted.append(targets)
+            loss += hits[hit_mask].sum()
+
+            # Check for secondary failure
+            failed = targets[self.wealth[targets] < FAILURE_THRESHOLD]
+            self.status[failed] = FAILED
+            new_failures.append(failed)
+
+        impacted = np.unique(np.concatenate(impacted)) if impacted else np.empty(0, dtype=np.int64)
+        new_failures = np.concatenate(new_failures) if new_failures else np.empty(0, dtype=np.int64)
+        return impacted, new_failures, {'loss': float(loss), 'absorbed': float(absorbed)}, intervention_report
+
+    def step(self, ccp=None):
+        """
+        Runs one contagion round with the same rules as NetworkManager.update_contagion.
+        Failed nodes are snapshotted at the start of the round; nodes failing during
+        the round stop receiving hits but only propagate on the next round.
+        Returns (impacted node indices, last intervention report).
+        """
+        impacted, _, _, intervention_report = self._propagate(np.flatnonzero(self.status == FAILED), ccp)
+        return impacted, intervention_report
+
+    def run_cascade(self, ccp=None, max_waves=None):
+        """
+        Propagates failures to a fixpoint, BFS style.
+        Each wave only processes the nodes that failed in the previous wave, so a failed
+        bank hits its neighbours exactly once. Sources are remembered in self.spent,
+        which lets later calls pick up only failures that have not propagated yet.
+        """
+        frontier = np.flatnonzero((self.status == FAILED) & ~self.spent)
+        waves = []
+        impacted = []
+        intervention_report = None
+
+        while frontier.size and (max_waves is None or len(waves) < max_waves):
+            self.spent[frontier] = True
+            wave_impacted, new_failures, totals, report = self._propagate(frontier, ccp)
+            intervention_report = report or intervention_report
+            impacted.append(wave_impacted)
+            waves.append({
+                'wave': len(waves) + 1,
+                'sources': int(frontier.size),
+                'impacted': int(wave_impacted.size),
+                'new_failures': int(new_failures.size),
+                'loss': totals['loss'],
+                'absorbed': totals['absorbed']
+            })
+            frontier = new_failures
+
+        impacted = np.unique(np.concatenate(impacted)) if impacted else np.empty(0, dtype=np.int64)
+        logger.info(f"Cascade settled after {len(waves)} waves: {impacted.size} banks impacted.")
+        return {
+            'waves': waves,
+            'impacted': impacted,
+            'pending': frontier,
+            'total_loss': sum(w['loss'] for w in waves),
+            'total_absorbed': sum(w['absorbed'] for w in waves),
+            'intervention': intervention_report
+        }
+
+    def sync_from(self, G, nodes):
+        """Reloads wealth and status of the given node indices from G (inverse of write_back)."""
+        codes = {'healthy': HEALTHY, 'stressed': STRESSED, 'failed': FAILED}
+        for i in nodes:
+            data = G.nodes[self.names[i]]
+            self.wealth[i] = data['wealth']
+            self.status[i] = codes[data['status']]
+
+    def write_back(self, G, nodes=None):
+        """
+        Copies wealth and status (and the derived colour) back into G.
+        Pass node indices to only sync a subset, e.g. the impacted set from step().
+        """
+        if nodes is None:
+            nodes = range(len(self.names))
+        for i in nodes:
+            data = G.nodes[self.names[i]]
+            data['wealth'] = float(self.wealth[i])
+            data['status'] = STATUS_NAMES[self.status[i]]
+            data['color'] = STATUS_COLORS[self.status[i]]
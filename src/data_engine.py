@@ -1,9 +1,15 @@
 import yfinance as yf
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
 from datetime import datetime, timedelta
 import logging
+import time
 import os
 
+from src.market_stream import YFinancePollingSource
+
 # Redirect yfinance cache to avoid permissions/WinError 183
 cache_dir = os.path.join(os.getcwd(), ".cache", "yfinance")
 os.makedirs(cache_dir, exist_ok=True)
@@ -12,8 +18,38 @@ yf.set_tz_cache_location(cache_dir)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PRICE_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def period_start(period, end=None):
+    """First date covered by a yfinance period string ("5d", "1mo", "1y", "ytd", "max")."""
+    end = pd.Timestamp(end or datetime.now()).normalize()
+    if period == "max":
+        return pd.Timestamp("1900-01-01")
+    if period == "ytd":
+        return end.replace(month=1, day=1)
+    units = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+    for suffix, unit in units.items():
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            return end - pd.DateOffset(**{unit: int(period[:-len(suffix)])})
+    raise ValueError(f"Unsupported period: {period}")
+
+
 class DataEngine:
-    def __init__(self, tickers=None):
+    """
+    Market data with a persistent local price store.
+    Each (ticker, interval) is kept as an uncompressed Feather file under cache_dir, read
+    back memory-mapped. A request serves whatever the store covers and only downloads the
+    missing head (dates before the store starts) and the stale tail (bars after the last
+    stored one) of the date range; offline=True never touches the network.
+    """
+
+    def __init__(self, tickers=None, cache_dir=None, offline=False, max_age_hours=12):
+        self.cache_dir = cache_dir or os.path.join(os.getcwd(), ".cache", "prices")
+        self.offline = offline
+        self.max_age = max_age_hours * 3600 # A store checked this recently counts as up to date
+        self.volatility = None # RollingVolatility seeded by get_latest_metrics
+        os.makedirs(self.cache_dir, exist_ok=True)
         if tickers is None:
             # Default set of major banks and tech for simulation
             self.tickers = [
@@ -25,46 +61,219 @@ class DataEngine:
         else:
             self.tickers = tickers
 
+    def _cache_path(self, ticker, interval):
+        return os.path.join(self.cache_dir, f"{ticker.replace('/', '_')}_{interval}.feather")
+
+    def _read_cache(self, ticker, interval):
+        """Returns (frame, first date the store was requested from), or (None, None)."""
+        path = self._cache_path(ticker, interval)
+        if not os.path.exists(path):
+            return None, None
+        table = feather.read_table(path, memory_map=True)
+        covered_from = pd.Timestamp(table.schema.metadata[b'covered_from'].decode())
+        return table.to_pandas().set_index('Date'), covered_from
+
+    def _write_cache(self, ticker, interval, frame, covered_from):
+        table = pa.Table.from_pandas(frame.reset_index(), preserve_index=False)
+        table = table.replace_schema_metadata({'covered_from': covered_from.isoformat()})
+        # Written aside and swapped in: frames read earlier may still be memory-mapped from the old file
+        path = self._cache_path(ticker, interval)
+        feather.write_feather(table, path + '.tmp', compression='uncompressed')
+        os.replace(path + '.tmp', path)
+
+    def _download(self, tickers, start, interval, end=None):
+        """One yfinance call for tickers sharing a date range (end exclusive); returns {ticker: frame}."""
+        data = yf.download(tickers, start=start, end=end, interval=interval, group_by='ticker', auto_adjust=True, progress=False)
+        if data is None or data.empty:
+            return {}
+        frames = {}
+        for ticker in tickers:
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker not in data.columns.get_level_values(0):
+                    continue
+                frame = data[ticker]
+            else:
+                frame = data
+            frame = frame[[c for c in PRICE_FIELDS if c in frame.columns]].dropna(how='all')
+            frame.index = pd.DatetimeIndex(frame.index).tz_localize(None)
+            frame.index.name = 'Date'
+            frames[ticker] = frame
+        return frames
+
     def get_historical_data(self, period="1y", interval="1d"):
         """
         Pulls daily adjusted prices and volume.
         auto_adjust=True handles stock splits automatically.
+        Served from the local store where possible; only missing date ranges are downloaded
+        and appended. Same (ticker, field) column layout as yf.download(group_by='ticker').
         """
-        logger.info(f"Fetching historical data for {len(self.tickers)} tickers...")
-        data = yf.download(
-            self.tickers, 
-            period=period, 
-            interval=interval, 
-            group_by='ticker', 
-            auto_adjust=True
-        )
+        start = time.perf_counter()
+        first_date = period_start(period)
+        cached, covered = {}, {}
+        for ticker in self.tickers:
+            cached[ticker], covered[ticker] = self._read_cache(ticker, interval)
+
+        # Group the tickers that need data by the (start, end) range they are missing
+        fetch = {}
+        if not self.offline:
+            for ticker, frame in cached.items():
+                path = self._cache_path(ticker, interval)
+                if frame is None or frame.empty:
+                    fetch.setdefault((first_date, None), []).append(ticker) # Nothing stored: full range
+                    continue
+                if covered[ticker] > first_date:
+                    fetch.setdefault((first_date, covered[ticker]), []).append(ticker) # Not stored far enough back: head only
+                if time.time() - os.path.getmtime(path) > self.max_age:
+                    fetch.setdefault((frame.index[-1], None), []).append(ticker) # Stale: refresh from the last stored bar
+
+        if fetch:
+            logger.info(f"Fetching historical data for {len({t for tickers in fetch.values() for t in tickers})} tickers...")
+        for (fetch_start, fetch_end), tickers in fetch.items():
+            try:
+                downloaded = self._download(tickers, fetch_start.strftime('%Y-%m-%d'), interval,
+                                            fetch_end.strftime('%Y-%m-%d') if fetch_end is not None else None)
+            except Exception as e:
+                logger.error(f"Download failed, serving cached data: {e}")
+                continue
+            for ticker in tickers:
+                new = downloaded.get(ticker)
+                old = cached[ticker]
+                if new is None or new.empty:
+                    if old is not None and covered[ticker] is not None and fetch_start < covered[ticker]:
+                        # Nothing traded that far back: remember the range was checked
+                        self._write_cache(ticker, interval, old, fetch_start)
+                        covered[ticker] = fetch_start
+                    elif old is not None:
+                        os.utime(self._cache_path(ticker, interval)) # Checked: nothing new yet
+                    continue
+                frame = new if old is None else pd.concat([old, new])
+                frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+                covered_from = min(fetch_start, covered[ticker]) if covered[ticker] is not None else fetch_start
+                self._write_cache(ticker, interval, frame, covered_from)
+                cached[ticker], covered[ticker] = frame, covered_from
+
+        frames = {}
+        for ticker in self.tickers:
+            frame = cached[ticker]
+            if frame is None or frame.empty:
+                logger.warning(f"No {'cached ' if self.offline else ''}data for {ticker}.")
+                continue
+            frames[ticker] = frame[frame.index >= first_date]
+        data = pd.concat(frames, axis=1) if frames else pd.DataFrame()
+        logger.info(f"Historical data: {len(frames)} tickers ready in {(time.perf_counter() - start)*1000:.0f}ms.")
         return data
 
-    def get_latest_metrics(self, data):
+    async def stream_bars(self, source=None):
+        """
+        Streaming counterpart of get_historical_data: async generator of bar batches
+        ({'timestamps', 'tickers', 'close'}) from a source in src/market_stream.py,
+        polling yfinance for self.tickers by default. Wrap the source in a MarketStream
+        to fan bars out to several consumers with backpressure.
+        """
+        source = source or YFinancePollingSource(self.tickers)
+        async for batch in source.bars():
+            yield batch
+
+    def get_close_prices(self, data):
+        """
+        Extracts a (dates x tickers) table of close prices from get_historical_data output.
+        """
+        if isinstance(data.columns, pd.MultiIndex):
+            tickers = [t for t in self.tickers if t in data.columns.get_level_values(0)]
+            return data.xs('Close', axis=1, level=1)[tickers]
+        return data[['Close']].rename(columns={'Close': self.tickers[0]})
+
+    def get_latest_metrics(self, data, window=30):
         """
         Calculates rolling volatility and returns the latest price/vol for each ticker.
+        The whole (dates x tickers) panel is handled as one array and only the last
+        window + 1 bars are read. Also seeds the incremental tracker used by update_latest_metrics.
         """
-        metrics = {}
-        for ticker in self.tickers:
-            try:
-                # Get close prices for this ticker
-                if isinstance(data.columns, pd.MultiIndex):
-                    ticker_data = data[ticker]
-                else:
-                    ticker_data = data
-                
-                close = ticker_data['Close']
-                returns = close.pct_change()
-                volatility = returns.rolling(window=30).std() * (252**0.5) # Annualized
-                
-                metrics[ticker] = {
-                    'price': close.iloc[-1],
-                    'volatility': volatility.iloc[-1],
-                    'prev_price': close.iloc[-2] if len(close) > 1 else close.iloc[-1]
-                }
-            except Exception as e:
-                logger.error(f"Error processing {ticker}: {e}")
-        return metrics
+        close = self.get_close_prices(data)
+        prices = close.to_numpy(dtype=np.float64)
+        returns = prices[-(window + 1):][1:] / prices[-(window + 1):][:-1] - 1
+        self.volatility = RollingVolatility(returns, prices[-1], window)
+        return self.volatility.metrics(close.columns, prices[-2] if len(prices) > 1 else prices[-1])
+
+    def update_latest_metrics(self, prices):
+        """
+        Incremental get_latest_metrics for one new bar of prices (aligned with the tickers of
+        the last get_latest_metrics call). O(tickers) per bar, independent of history length.
+        """
+        prev_price = self.volatility.last_price.copy()
+        self.volatility.update(np.asarray(prices, dtype=np.float64))
+        return self.volatility.metrics(self.volatility.tickers, prev_price)
+
+
+class RollingVolatility:
+    """
+    Annualised rolling volatility of every ticker over the last `window` returns, kept with
+    Welford's running mean / sum of squared deviations. A new bar adds one return and drops
+    the oldest one from a ring buffer, so the update is O(tickers).
+    Matches pandas' rolling(window).std(): sample std, NaN until the window holds window valid returns.
+    """
+
+    def __init__(self, returns, last_price, window=30, tickers=None):
+        self.window = window
+        self.tickers = tickers
+        self.last_price = np.array(last_price, dtype=np.float64)
+        n = len(self.last_price)
+        self.buffer = np.full((window, n), np.nan)
+        returns = np.asarray(returns, dtype=np.float64).reshape(-1, n)[-window:]
+        self.buffer[window - len(returns):] = returns
+        self.cursor = 0 # Oldest row of the ring buffer
+        self._recompute()
+
+    def _recompute(self):
+        """Exact mean / M2 from the buffer, e.g. after a NaN leaves the window."""
+        self.valid = np.count_nonzero(~np.isnan(self.buffer), axis=0)
+        self.mean = np.divide(np.nansum(self.buffer, axis=0), self.valid, out=np.zeros(len(self.last_price)), where=self.valid > 0)
+        self.m2 = np.nansum((self.buffer - self.mean) ** 2, axis=0)
+
+    def update(self, prices):
+        new = prices / self.last_price - 1
+        old = self.buffer[self.cursor].copy()
+        self.buffer[self.cursor] = new
+        self.cursor = (self.cursor + 1) % self.window
+        self.last_price = prices
+
+        if np.isnan(new).any() or np.isnan(old).any() or self.cursor == 0:
+            # Exact pass once per window turn (amortised O(tickers)) keeps rounding drift bounded
+            self._recompute()
+            return
+        # Windowed Welford: replace old with new in one step
+        mean = self.mean + (new - old) / self.window
+        self.m2 += (new - old) * (new - mean + old - self.mean)
+        self.mean = mean
+
+    def update_batch(self, prices):
+        """
+        Several new bars at once, (bars x tickers). Only the newest `window` returns survive,
+        so a long batch resets the buffer from its tail instead of stepping bar by bar.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        if len(prices) < self.window:
+            for bar in prices:
+                self.update(bar)
+            return
+        tail = np.vstack((self.last_price, prices[-(self.window + 1):]))[-(self.window + 1):]
+        self.buffer = tail[1:] / tail[:-1] - 1
+        self.cursor = 0
+        self.last_price = prices[-1]
+        self._recompute()
+
+    def annualised(self):
+        full = self.valid == self.window
+        return np.where(full, np.sqrt(np.maximum(self.m2, 0) / (self.window - 1)) * (252**0.5), np.nan)
+
+    def metrics(self, tickers, prev_price):
+        self.tickers = list(tickers)
+        volatility = self.annualised()
+        return {
+            ticker: {'price': price, 'volatility': vol, 'prev_price': prev}
+            for ticker, price, vol, prev in zip(self.tickers, self.last_price.tolist(), volatility.tolist(),
+                                                np.asarray(prev_price).tolist())
+        }
 
 if __name__ == "__main__":
     engine = DataEngine()
@@ -0,0 +1,90 @@
+import numpy as np
+import time
+import logging
+
+from src.clearing import ClearingSolver
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class DebtRank:
+    """
+    DebtRank (Battiston et al. 2012) on the weighted interbank network.
+    Impact of bank i on bank j is W[i, j] = min(1, exposure of j to i / equity of j), with
+    exposures from the ClearingSolver liability model and equity from current wealth.
+    Distress is propagated for many seed scenarios at once: the state is an
+    (n_banks x n_seeds) matrix and each step is a single sparse-dense product.
+    Banks with no equity left have already failed: they start every scenario at h = 1
+    and inactive, so their distress was passed on before and is not counted again.
+    """
+
+    def __init__(self, impact, value, names=None, failed=None):
+        self.WT = impact.T.tocsr() # Transposed so W^T @ H gives incoming distress
+        self.value = value
+        self.names = list(names) if names is not None else list(range(len(value)))
+        self.failed = np.zeros(len(value), dtype=bool) if failed is None else np.asarray(failed, dtype=bool)
+
+    @classmethod
+    def from_graph(cls, G, exposure_ratio=0.5):
+        return cls._from_solver(ClearingSolver.from_graph(G, exposure_ratio=exposure_ratio))
+
+    @classmethod
+    def from_engine(cls, engine, exposure_ratio=0.5):
+        return cls._from_solver(ClearingSolver.from_engine(engine, exposure_ratio=exposure_ratio))
+
+    @classmethod
+    def _from_solver(cls, solver):
+        equity = solver.e
+        failed = equity <= 0
+        inv_equity = np.divide(1.0, equity, out=np.full_like(equity, np.inf), where=~failed)
+        impact = solver.L.multiply(inv_equity[np.newaxis, :]).tocsr()
+        impact.data = np.minimum(impact.data, 1.0)
+        equity = np.where(failed, 0.0, equity)
+        value = equity / equity.sum() if equity.sum() > 0 else np.zeros_like(equity)
+        return cls(impact, value, solver.names, failed=failed)
+
+    def propagate(self, H):
+        """
+        Runs the distress dynamics to completion for every column of H (initial distress
+        per bank, one column per scenario). A bank passes on distress once, in the step
+        after its distress last increased; failed banks are held at 1 and never pass it on.
+        """
+        H = np.array(H, dtype=np.float64)
+        H[self.failed] = 1.0
+        inactive = np.broadcast_to(self.failed[:, np.newaxis], H.shape).copy()
+        active = (H > 0) & ~inactive
+        steps = 0
+        while active.any():
+            H_new = np.minimum(1.0, H + self.WT @ np.where(active, H, 0.0))
+            inactive |= active
+            active = (H_new > H) & ~inactive
+            H = H_new
+            steps += 1
+        return H, steps
+
+    def run(self, seeds=None, psi=1.0, batch_size=256):
+        """
+        DebtRank of each seed bank defaulting on its own (psi = initial distress).
+        seeds defaults to every bank; they are processed batch_size columns at a time
+        so memory stays at O(n_banks * batch_size).
+        """
+        start = time.perf_counter()
+        n = len(self.value)
+        seeds = np.arange(n) if seeds is None else np.asarray(seeds)
+        scores = np.empty(len(seeds))
+
+        for offset in range(0, len(seeds), batch_size):
+            batch = seeds[offset:offset + batch_size]
+            H0 = np.zeros((n, len(batch)))
+            H0[batch, np.arange(len(batch))] = psi
+            H0[self.failed] = 1.0
+            H, _ = self.propagate(H0)
+            scores[offset:offset + len(batch)] = self.value @ H - self.value @ H0
+
+        logger.info(f"DebtRank: scored {len(seeds)} seeds in {(time.perf_counter() - start)*1000:.1f}ms.")
+        return scores
+
+    def scores(self, **kwargs):
+        """{bank: DebtRank} for every bank."""
+        return dict(zip(self.names, self.run(**kwargs).tolist()))
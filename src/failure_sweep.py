@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.contagion_engine import FAILED
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SWEEP_COLUMNS = ['seed_wealth', 'contagion_loss', 'total_loss', 'failures', 'ccp_drawdown', 'waves']
+
+# Per-process state for pool workers, set once by _init_worker
+_worker_engine = None
+_worker_ccp = None
+
+
+def _init_worker(engine, ccp):
+    global _worker_engine, _worker_ccp
+    _worker_engine, _worker_ccp = engine, ccp
+    logging.disable(logging.INFO) # Per-case cascade/CCP logs would swamp the pool
+
+
+def evaluate_failure(engine, ccp, seed):
+    """
+    Fails one bank on a fork of the engine (and CCP) and cascades to a fixpoint.
+    The live arrays are never written. Returns a row matching SWEEP_COLUMNS.
+    """
+    case = engine.fork()
+    case_ccp = ccp.fork() if ccp else None
+    seed_wealth = case.wealth[seed]
+    failed_before = np.count_nonzero(case.status == FAILED)
+
+    case.status[seed] = FAILED
+    case.wealth[seed] = 0
+    result = case.run_cascade(case_ccp)
+
+    failures = np.count_nonzero(case.status == FAILED) - failed_before
+    return np.array([
+        seed_wealth, result['total_loss'], seed_wealth + result['total_loss'],
+        failures, result['total_absorbed'], len(result['waves'])
+    ])
+
+
+def _evaluate_batch(seeds):
+    return np.vstack([evaluate_failure(_worker_engine, _worker_ccp, s) for s in seeds])
+
+
+class FailureSweep:
+    """
+    Evaluates the full cascade of every candidate initial failure against the current state.
+    Failures that already happened are treated as spent, so each case only measures the
+    damage its own seed adds. Cases run on copy-on-write forks of one compiled engine,
+    optionally spread over a process pool (the engine is shipped to each worker once).
+    """
+
+    def __init__(self, engine, ccp=None, max_workers=1, chunk_size=64):
+        self.engine = engine.fork()
+        self.engine.spent |= self.engine.status == FAILED
+        self.ccp = ccp
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+
+    def run(self, candidates=None):
+        """
+        candidates: bank names (default: every bank that has not failed yet).
+        Returns a DataFrame ranked by total loss.
+        """
+        start = time.perf_counter()
+        engine = self.engine
+        if candidates is None:
+            seeds = np.flatnonzero(engine.status != FAILED)
+        else:
+            seeds = np.array([engine.index[name] for name in candidates if engine.status[engine.index[name]] != FAILED], dtype=np.int64)
+
+        rows = np.empty((len(seeds), len(SWEEP_COLUMNS)))
+        chunks = [(i, seeds[i:i + self.chunk_size]) for i in range(0, len(seeds), self.chunk_size)]
+
+        if self.max_workers == 1:
+            previous = logging.root.manager.disable
+            logging.disable(logging.INFO)
+            try:
+                for offset, chunk in chunks:
+                    for k, seed in enumerate(chunk):
+                        rows[offset + k] = evaluate_failure(engine, self.ccp, seed)
+            finally:
+                logging.disable(previous)
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker, initargs=(engine, self.ccp)) as pool:
+                futures = {pool.submit(_evaluate_batch, chunk): (offset, len(chunk)) for offset, chunk in chunks}
+                for future in as_completed(futures):
+                    offset, size = futures[future]
+                    rows[offset:offset + size] = future.result()
+
+        table = pd.DataFrame(rows, columns=SWEEP_COLUMNS)
+        table[['failures', 'waves']] = table[['failures', 'waves']].astype(int)
+        table.insert(0, 'bank', [engine.names[i] for i in seeds])
+        table.insert(1, 'type', engine.node_type[seeds] if engine.node_type is not None else '')
+        table = table.sort_values('total_loss', ascending=False, ignore_index=True)
+
+        logger.info(f"Failure sweep: {len(seeds)} scenarios in {time.perf_counter() - start:.2f}s.")
+        return table
@@ -0,0 +1,124 @@
+import re
+import json
+import time
+import logging
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Keyword -> weight per category. A headline's score in a category is the sum of the
+# weights of the keywords it contains.
+DEFAULT_LEXICON = {
+    'systemic': {'collapse': 1.0, 'crisis': 1.0, 'loss': 1.0, 'subprime': 1.0, 'default': 1.0,
+                 'warning': 1.0, 'bankrupt': 1.0, 'contagion': 1.0, 'crash': 1.0},
+    'neutral': {'split': 1.0, 'dividend': 1.0}
+}
+INFLECTIONS = r'(?:s|es|d|ed|ing|cy)?' # 'losses', 'defaulted', 'bankruptcy' still match their keyword
+BASE_SCORE = 6 # Health score of a headline with no keywords
+
+
+class KeywordMatcher:
+    """
+    Weighted keyword classifier, the offline fallback for the LLM.
+    All keywords are compiled into one alternation regex with word boundaries, so a
+    headline is scanned once whatever the lexicon size and 'loss' no longer fires on
+    'glossy'. classify_many joins a whole batch into one text and scans it in a single
+    pass, attributing matches to headlines by offset.
+    """
+
+    def __init__(self, lexicon=None, threshold=1.0):
+        self.lexicon = {category: {word.lower(): float(weight) for word, weight in words.items()}
+                        for category, words in (lexicon or DEFAULT_LEXICON).items()}
+        self.categories = list(self.lexicon)
+        self.threshold = threshold # Systemic weight at which a headline is a Systemic Warning
+
+        # Keyword -> weight in each category, one row per keyword
+        self.keywords = sorted({word for words in self.lexicon.values() for word in words}, key=len, reverse=True)
+        self._index = {word: k for k, word in enumerate(self.keywords)}
+        self.weights = np.zeros((len(self.keywords), len(self.categories)))
+        for c, category in enumerate(self.categories):
+            for word, weight in self.lexicon[category].items():
+                self.weights[self._index[word], c] = weight
+        alternation = '|'.join(re.escape(word) for word in self.keywords) or r'(?!)'
+        self.pattern = re.compile(rf'\b({alternation}){INFLECTIONS}\b')
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Loads a lexicon from JSON: {"systemic": {"collapse": 1.0, ...}, "neutral": {...}}."""
+        with open(path) as f:
+            lexicon = json.load(f)
+        logger.info(f"Keyword lexicon: {sum(len(words) for words in lexicon.values())} keywords from {path}.")
+        return cls(lexicon, **kwargs)
+
+    def _category(self, scores, name):
+        return scores[:, self.categories.index(name)] if name in self.categories else np.zeros(len(scores))
+
+    def scores(self, headlines):
+        """(headlines x categories) keyword weight sums, columns ordered as self.categories."""
+        headlines = list(headlines)
+        scores = np.zeros((len(headlines), len(self.categories)))
+        if not headlines:
+            return scores
+        # '\n' cannot occur inside a match, so offsets map every match to one headline.
+        # Offsets come from the lowered text: lower() can change a string's length ('İ')
+        lowered = [h.lower() for h in headlines]
+        text = '\n'.join(lowered)
+        starts = np.cumsum([0] + [len(h) + 1 for h in lowered[:-1]])
+        index = self._index
+        positions, keywords = [], []
+        for match in self.pattern.finditer(text):
+            positions.append(match.start())
+            keywords.append(index[match.group(1)])
+        if keywords:
+            rows = np.searchsorted(starts, positions, side='right') - 1
+            np.add.at(scores, rows, self.weights[keywords])
+        return scores
+
+    def classify_many(self, headlines):
+        """
+        Health scores (int array, 1-10) for a batch of headlines: systemic keywords pull the
+        score down from BASE_SCORE by 4 per unit weight, neutral corporate actions lift it
+        by 2 when nothing systemic was found.
+        """
+        scores = self.scores(headlines)
+        systemic = self._category(scores, 'systemic')
+        neutral = self._category(scores, 'neutral')
+        health = np.where(systemic >= self.threshold, BASE_SCORE - 4 * systemic, BASE_SCORE - 4 * systemic + 2 * neutral)
+        return np.clip(np.rint(health), 1, 10).astype(np.int64)
+
+    def classify(self, headline):
+        """Verdict dict for one headline, in the format the LLM is asked for."""
+        scores = self.scores([headline])
+        health = int(self.classify_many([headline])[0])
+        if self._category(scores, 'systemic')[0] >= self.threshold:
+            return {
+                "classification": "Systemic Warning",
+                "reasoning": "Fallback: Detected high-risk keywords in headline.",
+                "health_score": health
+            }
+        if self._category(scores, 'neutral')[0] > 0:
+            return {
+                "classification": "Idiosyncratic/Neutral",
+                "reasoning": "Fallback: Detected neutral corporate action (split/dividend).",
+                "health_score": health
+            }
+        return {
+            "classification": "Neutral",
+            "reasoning": "Fallback: Headline appears non-critical.",
+            "health_score": health
+        }
+
+
+if __name__ == "__main__":
+    matcher = KeywordMatcher()
+    rng = np.random.default_rng(0)
+    words = ['bank', 'markets', 'rally', 'rates', 'central', 'reports', 'quarterly', 'earnings', 'stock',
+             'glossy', 'faults', 'loss', 'crisis', 'split', 'dividend', 'outlook', 'growth', 'jobs']
+    headlines = [' '.join(rng.choice(words, size=10)).capitalize() + '.' for _ in range(100_000)]
+
+    start = time.perf_counter()
+    health = matcher.classify_many(headlines)
+    elapsed = time.perf_counter() - start
+    print(f"classify_many: {len(headlines)} headlines in {elapsed:.3f}s ({len(headlines) / elapsed:,.0f} headlines/s)")
+    print(f"Systemic warnings: {(health <= 2).sum()}")
@@ -0,0 +1,126 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class StubLLMServer:
+    """
+    Local stand-in for the Featherless /chat/completions endpoint, for exercising
+    NewsAnalyzer without an API key or network:
+        FEATHERLESS_API_KEY=stub FEATHERLESS_API_BASE=http://127.0.0.1:8765/v1
+    Replies with a keyword-based verdict after `latency` seconds: one object for a single
+    headline, an indexed array for a batched prompt, sent as SSE chunks when the request
+    asks to stream. A share of requests can be answered with 503 (error_rate) or
+    429 + Retry-After (rate_limit_rate).
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, latency=0.2, error_rate=0.0, rate_limit_rate=0.0, retry_after=0.1, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{self.server.server_port}/v1"
+        self._thread = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, so pooled clients reuse connections
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, content, chunk_size=16):
+                events = [{"choices": [{"delta": {"content": content[i:i + chunk_size]}}]}
+                          for i in range(0, len(content), chunk_size)]
+                data = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Content-Length", str(len(data.encode())))
+                self.end_headers()
+                self.wfile.write(data.encode())
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with stub._lock:
+                    stub.requests += 1
+                    stub.connections.add(self.client_address)
+                    roll = stub.rng.random()
+                if not self.path.endswith("/chat/completions"):
+                    return self._reply(404, {"error": {"message": "Not found"}})
+                time.sleep(stub.latency)
+                if roll < stub.rate_limit_rate:
+                    return self._reply(429, {"error": {"message": "Rate limit exceeded"}}, {"Retry-After": str(stub.retry_after)})
+                if roll < stub.rate_limit_rate + stub.error_rate:
+                    return self._reply(503, {"error": {"message": "Service unavailable"}})
+                content = stub.respond(body["messages"][-1]["content"])
+                if body.get("stream"):
+                    return self._stream(content)
+                return self._reply(200, {"choices": [{"message": {"role": "assistant", "content": content}}]})
+
+        return Handler
+
+    @staticmethod
+    def verdict(headline):
+        headline = headline.lower()
+        systemic = any(word in headline for word in ('collapse', 'crisis', 'loss', 'default', 'bankrupt', 'crash'))
+        return {
+            "classification": "Systemic Warning" if systemic else "Idiosyncratic/Neutral",
+            "reasoning": "Stub: keyword verdict.",
+            "health_score": 2 if systemic else 7
+        }
+
+    def respond(self, prompt):
+        """Keyword verdicts in the same JSON format the real model is asked for."""
+        numbered = re.findall(r'^\s*\[(\d+)\] "(.*)"$', prompt, re.MULTILINE)
+        if numbered:
+            return json.dumps([{"index": int(i), **self.verdict(headline)} for i, headline in numbered], indent=2)
+        match = re.search(r'Headline: "(.*)"', prompt)
+        return json.dumps(self.verdict(match.group(1) if match else prompt))
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Stub LLM server listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the /chat/completions endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    stub = StubLLMServer(port=args.port, latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    logger.info(f"Stub LLM server listening on {stub.base_url}")
+    stub.server.serve_forever()
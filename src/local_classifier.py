@@ -0,0 +1,79 @@
+import numpy as np
+import time
+import logging
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LocalClassifier:
+    """
+    Small CPU model in front of the LLM: TF-IDF word and bigram features with a logistic
+    regression, trained on the LLM's own cached verdicts.
+    Only predictions whose class probability reaches the threshold are trusted; the rest
+    are left for the LLM. The health score is the class-probability-weighted mean of the
+    scores the LLM gave each class in training.
+    """
+
+    def __init__(self, threshold=0.9, min_samples=50):
+        self.threshold = threshold
+        self.min_samples = min_samples
+        self.model = None
+        self.classes = []
+        self.class_health = None # Mean LLM health score per class, aligned with self.classes
+
+    @property
+    def fitted(self):
+        return self.model is not None
+
+    def fit(self, headlines, verdicts):
+        """
+        Trains on (headline, verdict dict) pairs. Returns a report dict; the model stays
+        unfitted when there are fewer than min_samples pairs or only one class.
+        """
+        labels = [verdict.get('classification') for verdict in verdicts]
+        rows = [k for k, label in enumerate(labels) if label]
+        headlines = [headlines[k] for k in rows]
+        labels = np.array([labels[k] for k in rows])
+        health = np.array([float(verdicts[k].get('health_score', np.nan)) for k in rows])
+        classes = sorted(set(labels.tolist()))
+        report = {'samples': len(labels), 'classes': classes, 'fitted': False}
+        if len(labels) < self.min_samples or len(classes) < 2:
+            logger.info(f"Local classifier: {len(labels)} labelled headlines, {len(classes)} classes; not trained.")
+            return report
+
+        start = time.perf_counter()
+        model = make_pipeline(TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1),
+                              LogisticRegression(C=4.0, class_weight='balanced', max_iter=1000))
+        model.fit(headlines, labels)
+        self.model = model
+        self.classes = list(model.classes_)
+        self.class_health = np.array([np.nanmean(health[labels == label]) if np.isfinite(health[labels == label]).any() else 5.0
+                                      for label in self.classes])
+        report.update({'fitted': True, 'train_accuracy': float(model.score(headlines, labels)),
+                       'train_ms': (time.perf_counter() - start) * 1000})
+        logger.info(f"Local classifier: trained on {len(labels)} headlines in {report['train_ms']:.0f}ms, "
+                    f"train accuracy {report['train_accuracy']:.1%}.")
+        return report
+
+    def predict(self, headlines):
+        """(labels, confidence, health_scores) arrays for a batch of headlines."""
+        proba = self.model.predict_proba(list(headlines))
+        best = proba.argmax(axis=1)
+        health = np.clip(np.rint(proba @ self.class_health), 1, 10).astype(np.int64)
+        return np.array(self.classes)[best], proba[np.arange(len(best)), best], health
+
+    def confident(self, headlines):
+        """Verdict dicts for headlines the model is sure about, None for the rest."""
+        if not self.fitted or not len(headlines):
+            return [None] * len(headlines)
+        labels, confidence, health = self.predict(headlines)
+        return [{
+            "classification": str(label),
+            "reasoning": f"Local model: {p:.0%} confident.",
+            "health_score": int(score)
+        } if p >= self.threshold else None for label, p, score in zip(labels, confidence, health)]
@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+import asyncio
+import inspect
+import time
+import logging
+
+import yfinance as yf
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A batch of bars is a dict: 'timestamps' (bars,), 'tickers' [tickers], 'close' (bars x tickers)
+
+
+def _batch(timestamps, tickers, close):
+    return {'timestamps': np.asarray(timestamps), 'tickers': list(tickers), 'close': np.asarray(close, dtype=np.float64)}
+
+
+class ReplaySource:
+    """
+    Replays a (dates x tickers) close-price table, or a CSV / Parquet / Feather file of one
+    (first column = timestamp), in batches of batch_size bars.
+    speed=None pushes bars as fast as consumers take them; speed=60 plays one minute of
+    market time per second of wall time.
+    """
+
+    def __init__(self, prices, batch_size=1024, speed=None):
+        if isinstance(prices, str):
+            prices = self._load(prices)
+        self.prices = prices
+        self.batch_size = batch_size
+        self.speed = speed
+
+    @staticmethod
+    def _load(path):
+        if path.endswith('.parquet'):
+            frame = pd.read_parquet(path)
+        elif path.endswith('.feather'):
+            frame = pd.read_feather(path)
+        else:
+            frame = pd.read_csv(path)
+        if not isinstance(frame.index, pd.DatetimeIndex):
+            frame = frame.set_index(frame.columns[0])
+            frame.index = pd.to_datetime(frame.index)
+        return frame
+
+    async def bars(self):
+        timestamps = self.prices.index.to_numpy()
+        close = self.prices.to_numpy(dtype=np.float64)
+        tickers = list(self.prices.columns)
+        wall_start, market_start = time.perf_counter(), timestamps[0] if len(timestamps) else None
+        for offset in range(0, len(close), self.batch_size):
+            if self.speed:
+                # Hold each batch until its first bar is due in scaled market time
+                due = (timestamps[offset] - market_start) / np.timedelta64(1, 's') / self.speed
+                await asyncio.sleep(max(0.0, due - (time.perf_counter() - wall_start)))
+            yield _batch(timestamps[offset:offset + self.batch_size], tickers, close[offset:offset + self.batch_size])
+
+
+class GBMSource:
+    """Synthetic geometric Brownian motion bars, seeded for reproducible streams."""
+
+    def __init__(self, tickers, s0=100.0, mu=0.05, sigma=0.2, bar_seconds=60, n_bars=390, batch_size=1024, seed=None):
+        self.tickers = list(tickers)
+        self.s0 = np.broadcast_to(np.asarray(s0, dtype=np.float64), (len(self.tickers),)).copy()
+        self.mu, self.sigma = mu, sigma
+        self.bar_seconds = bar_seconds
+        self.n_bars = n_bars
+        self.batch_size = batch_size
+        self.rng = np.random.default_rng(seed)
+
+    async def bars(self):
+        dt = self.bar_seconds / (252 * 6.5 * 3600) # Fraction of a trading year per bar
+        drift = (self.mu - 0.5 * self.sigma ** 2) * dt
+        price = self.s0.copy()
+        start = np.datetime64(pd.Timestamp.now().normalize().replace(hour=9, minute=30))
+        for offset in range(0, self.n_bars, self.batch_size):
+            size = min(self.batch_size, self.n_bars - offset)
+            shocks = drift + self.sigma * np.sqrt(dt) * self.rng.standard_normal((size, len(self.tickers)))
+            close = price * np.exp(np.cumsum(shocks, axis=0))
+            price = close[-1]
+            timestamps = start + (offset + 1 + np.arange(size)) * np.timedelta64(self.bar_seconds, 's')
+            yield _batch(timestamps, self.tickers, close)
+            await asyncio.sleep(0) # Let consumers run between batches
+
+
+class YFinancePollingSource:
+    """Polls yfinance for the latest intraday bars and emits only bars not seen before."""
+
+    def __init__(self, tickers, interval="1m", poll_seconds=60, max_polls=None):
+        self.tickers = list(tickers)
+        self.interval = interval
+        self.poll_seconds = poll_seconds
+        self.max_polls = max_polls
+
+    async def bars(self):
+        last_seen = None
+        polls = 0
+        while self.max_polls is None or polls < self.max_polls:
+            polls += 1
+            try:
+                data = await asyncio.to_thread(yf.download, self.tickers, period="1d", interval=self.interval,
+                                               group_by='ticker', auto_adjust=True, progress=False)
+            except Exception as e:
+                logger.error(f"Stream poll failed: {e}")
+                data = None
+            if data is not None and not data.empty:
+                if isinstance(data.columns, pd.MultiIndex):
+                    close = data.xs('Close', axis=1, level=1).reindex(columns=self.tickers)
+                else:
+                    close = data[['Close']].rename(columns={'Close': self.tickers[0]})
+                if last_seen is not None:
+                    close = close[close.index > last_seen]
+                if len(close):
+                    last_seen = close.index[-1]
+                    yield _batch(close.index.to_numpy(), self.tickers, close.to_numpy(dtype=np.float64))
+            await asyncio.sleep(self.poll_seconds)
+
+
+class MarketStream:
+    """
+    Fans bar batches from one source out to subscribers.
+    Every subscriber has its own bounded queue: when a consumer falls max_pending batches
+    behind, the producer waits (backpressure) instead of buffering without limit.
+    Subscribers are plain or async callables taking a batch dict.
+    """
+
+    def __init__(self, source, max_pending=8):
+        self.source = source
+        self.max_pending = max_pending
+        self.subscribers = []
+        self.bars_pushed = 0
+        self._failure = None
+
+    def subscribe(self, handler, name=None):
+        self.subscribers.append((name or getattr(handler, '__name__', 'subscriber'), handler))
+        return handler
+
+    async def _consume(self, name, handler, queue):
+        is_async = inspect.iscoroutinefunction(handler)
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            if self._failure is not None:
+                continue # Keep draining so the producer never blocks on a dead subscriber
+            try:
+                result = handler(batch)
+                if is_async or inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Market stream: subscriber {name} failed: {e}")
+                self._failure = e
+
+    async def run(self):
+        """Drives the source to the end (or until cancelled). Returns the number of bars pushed."""
+        start = time.perf_counter()
+        queues = [asyncio.Queue(maxsize=self.max_pending) for _ in self.subscribers]
+        workers = [asyncio.create_task(self._consume(name, handler, queue)) for (name, handler), queue in zip(self.subscribers, queues)]
+        self._failure = None
+        try:
+            async for batch in self.source.bars():
+                if self._failure is not None:
+                    raise self._failure
+                for queue in queues:
+                    await queue.put(batch)
+                self.bars_pushed += len(batch['timestamps'])
+            for queue in queues:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            if self._failure is not None:
+                raise self._failure
+        finally:
+            for worker in workers:
+                worker.cancel()
+        elapsed = time.perf_counter() - start
+        logger.info(f"Market stream: {self.bars_pushed} bars to {len(self.subscribers)} subscribers in {elapsed:.2f}s.")
+        return self.bars_pushed
+
+
+def volatility_subscriber(tracker):
+    """
+    Feeds every bar into a RollingVolatility tracker (see DataEngine.get_latest_metrics).
+    Columns are reindexed by ticker name onto tracker.tickers; tickers missing from a batch
+    get NaN, tickers the tracker does not follow are dropped.
+    """
+    def on_bars(batch):
+        if tracker.tickers is None:
+            tracker.tickers = list(batch['tickers'])
+        column = {ticker: k for k, ticker in enumerate(batch['tickers'])}
+        prices = np.full((len(batch['close']), len(tracker.tickers)), np.nan)
+        known = [k for k, ticker in enumerate(tracker.tickers) if ticker in column]
+        prices[:, known] = batch['close'][:, [column[tracker.tickers[k]] for k in known]]
+        tracker.update_batch(prices)
+    return on_bars
+
+
+def margin_subscriber(scheduler):
+    """Feeds each batch into a VariationMarginScheduler as one burst of ticks."""
+    def on_bars(batch):
+        ids = np.array([scheduler.instrument_index[ticker] for ticker in batch['tickers']])
+        prices = batch['close'].reshape(-1)
+        valid = ~np.isnan(prices)
+        scheduler.process_ticks(np.tile(ids, len(batch['close']))[valid], prices[valid])
+    return on_bars
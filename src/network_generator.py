@@ -0,0 +1,140 @@
+import numpy as np
+import time
+import logging
+
+from src.contagion_engine import ContagionEngine, HEALTHY
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Exposure weight ranges, same as NetworkManager.initialize_network
+CORE_WEIGHT = (0.7, 1.0)
+SPOKE_WEIGHT = (0.2, 0.6)
+
+
+class NetworkGenerator:
+    """
+    Builds large interbank networks directly as edge arrays and compiles them into a
+    ContagionEngine (CSR adjacency + node arrays) without going through NetworkX.
+    Meant for load-testing the contagion, cascade and clearing code at 10k-1M banks.
+    """
+
+    def __init__(self, seed=None, max_wealth=150000):
+        self.rng = np.random.default_rng(seed)
+        self.max_wealth = max_wealth
+
+    def hub_spoke(self, num_hubs=8, num_spokes=100000):
+        """
+        Scaled-up NetworkManager topology: a fully connected hub core and spokes
+        linked to 1-2 distinct hubs each.
+        """
+        start = time.perf_counter()
+        hub_i, hub_j = np.triu_indices(num_hubs, k=1)
+
+        spokes = np.arange(num_hubs, num_hubs + num_spokes)
+        first_hub = self.rng.integers(num_hubs, size=num_spokes)
+        second_hub = (first_hub + self.rng.integers(1, max(num_hubs, 2), size=num_spokes)) % num_hubs
+        two_links = self.rng.integers(1, min(2, num_hubs) + 1, size=num_spokes) == 2
+
+        u = np.concatenate([hub_i, spokes, spokes[two_links]])
+        v = np.concatenate([hub_j, first_hub, second_hub[two_links]])
+        w = np.concatenate([
+            self.rng.uniform(*CORE_WEIGHT, size=hub_i.size),
+            self.rng.uniform(*SPOKE_WEIGHT, size=num_spokes + two_links.sum())
+        ])
+        return self._build(num_hubs + num_spokes, u, v, w, num_hubs, start)
+
+    def scale_free(self, num_nodes=100000, avg_degree=4, exponent=2.5, num_hubs=8):
+        """
+        Chung-Lu random graph with a power-law expected degree sequence.
+        Edge endpoints are drawn in one batch with probability proportional to the
+        expected degree; the num_hubs banks with the highest expected degree are labelled hubs.
+        """
+        start = time.perf_counter()
+        expected_degree = np.arange(1, num_nodes + 1, dtype=np.float64) ** (-1.0 / (exponent - 1))
+        num_edges = int(num_nodes * avg_degree / 2)
+
+        endpoints = self.rng.choice(num_nodes, size=(num_edges, 2), p=expected_degree / expected_degree.sum())
+        u, v = endpoints[:, 0], endpoints[:, 1]
+        core = (u < num_hubs) & (v < num_hubs)
+        w = np.where(core, self.rng.uniform(*CORE_WEIGHT, size=num_edges), self.rng.uniform(*SPOKE_WEIGHT, size=num_edges))
+        return self._build(num_nodes, u, v, w, num_hubs, start)
+
+    def core_periphery(self, num_nodes=100000, core_fraction=0.01, core_degree=30, periphery_core_links=1.5, periphery_degree=0.5):
+        """
+        Core-periphery network calibrated by average degrees:
+        core_degree       - links each core bank has inside the core (capped at a complete core)
+        periphery_core_links - mean links from a periphery bank into the core (at least one)
+        periphery_degree  - mean links among periphery banks
+        """
+        start = time.perf_counter()
+        num_core = max(2, int(num_nodes * core_fraction))
+        num_periphery = num_nodes - num_core
+
+        if core_degree >= num_core - 1:
+            cc_u, cc_v = np.triu_indices(num_core, k=1)
+        else:
+            m = int(num_core * core_degree / 2)
+            cc_u, cc_v = self.rng.integers(num_core, size=m), self.rng.integers(num_core, size=m)
+
+        links = 1 + self.rng.poisson(max(periphery_core_links - 1, 0), size=num_periphery)
+        cp_u = np.repeat(np.arange(num_core, num_nodes), links)
+        cp_v = self.rng.integers(num_core, size=cp_u.size)
+
+        m = int(num_periphery * periphery_degree / 2)
+        pp_u = self.rng.integers(num_core, num_nodes, size=m)
+        pp_v = self.rng.integers(num_core, num_nodes, size=m)
+
+        u = np.concatenate([cc_u, cp_u, pp_u])
+        v = np.concatenate([cc_v, cp_v, pp_v])
+        w = np.concatenate([
+            self.rng.uniform(*CORE_WEIGHT, size=cc_u.size),
+            self.rng.uniform(*SPOKE_WEIGHT, size=cp_u.size + m)
+        ])
+        return self._build(num_nodes, u, v, w, num_core, start)
+
+    def _build(self, num_nodes, u, v, w, num_hubs, start):
+        """
+        Turns an undirected edge list into a ContagionEngine.
+        Self-loops and duplicate edges are dropped (first weight wins), both directions are
+        stored, and Pareto wealth is handed out in order of degree so hubs are the richest.
+        """
+        u, v = u.astype(np.int64), v.astype(np.int64)
+        keep = u != v
+        lo, hi, w = np.minimum(u, v)[keep], np.maximum(u, v)[keep], w[keep]
+        _, first = np.unique(lo * num_nodes + hi, return_index=True)
+        lo, hi, w = lo[first], hi[first], w[first]
+
+        rows = np.concatenate([lo, hi])
+        order = np.argsort(rows, kind='stable')
+        indices = np.concatenate([hi, lo])[order]
+        weights = np.concatenate([w, w])[order]
+        degree = np.bincount(rows, minlength=num_nodes)
+        indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(degree, out=indptr[1:])
+
+        # Initial Wealth Distribution
+        wealth_draws = self.rng.pareto(1.5, num_nodes) + 1
+        wealth_draws = np.sort(wealth_draws / wealth_draws.max() * self.max_wealth)[::-1]
+        wealth = np.empty(num_nodes)
+        wealth[np.argsort(-degree, kind='stable')] = wealth_draws
+
+        node_type = np.full(num_nodes, 'spoke', dtype=object)
+        node_type[:num_hubs] = 'hub'
+        names = [f"Hub {i}" for i in range(num_hubs)] + [f"Bank {i}" for i in range(num_hubs, num_nodes)]
+
+        engine = ContagionEngine(
+            names, indptr, indices, weights, wealth,
+            np.full(num_nodes, HEALTHY, dtype=np.int8), node_type
+        )
+        logger.info(f"Generated {num_nodes} banks / {lo.size} links in {time.perf_counter() - start:.2f}s.")
+        return engine
+
+
+if __name__ == "__main__":
+    gen = NetworkGenerator(seed=0)
+    for build in (gen.hub_spoke, gen.scale_free, gen.core_periphery):
+        engine = build()
+        engine.fail_node(engine.names[0])
+        result = engine.run_cascade()
+        print(f"{build.__name__}: {len(result['waves'])} waves, {result['impacted'].size} banks impacted")
@@ -1,15 +1,28 @@
 import networkx as nx
 import numpy as np
 import pandas as pd
-import random
 import logging
+import json
+from collections import deque
+
+from src.contagion_engine import ContagionEngine, STATUS_NAMES, STATUS_COLORS, HEALTHY, STRESSED, FAILED
+from src.clearing import ClearingSolver
+from src.systemic_metrics import SystemicMetrics
+from src.netting import NettingCalculator
+from src.failure_sweep import FailureSweep
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class NetworkManager:
-    def __init__(self, num_hubs=4, num_spokes=40):
+    def __init__(self, num_hubs=4, num_spokes=40, seed=None, build=True):
+        """
+        seed: an int, SeedSequence or numpy Generator. Two managers built from the same
+        seed produce the same graph; None draws fresh OS entropy.
+        build=False leaves G empty (used when restoring a snapshot).
+        """
         self.G = nx.Graph()
+        self.rng = np.random.default_rng(seed)
         self.num_hubs = num_hubs
         self.num_spokes = num_spokes
         self.major_hubs = ["JPMorgan Chase", "Goldman Sachs", "Morgan Stanley", "Bank of America", "Citigroup", "HSBC", "BNP Paribas", "Deutsche Bank"]
@@ -23,41 +36,62 @@ class NetworkManager:
             "National Australia Bank", "Commonwealth Bank", "Westpac", "ANZ", "DBS Bank",
             "OCBC", "UOB", "Standard Bank", "Absa Group", "Nedbank"
         ]
-        self.initialize_network()
+        self.cascaded = set() # Failed banks whose losses have already been propagated by run_cascade
+        # Bumped whenever edges (topology_version) or wealth/status (state_version) change
+        self.topology_version = 0
+        self.state_version = 0
+        self.metrics = SystemicMetrics(self)
+        self.netting = NettingCalculator(self) # Gross vs bilateral vs multilateral exposure, cached per topology_version
+        self._edge_cache = None # (topology_version, edge arrays), reused by every snapshot of the same graph
+        # Compiled engine kept in step with G: rebuilt on topology changes only, otherwise
+        # the nodes named in _dirty are resynced before the next array run
+        self._engine = None
+        self._engine_topology = None
+        self._dirty = set()
+        if build:
+            self.initialize_network()
 
     def initialize_network(self):
         """
         Creates a hub-and-spoke financial network with realistic bank names.
         """
         # Assign real names to hubs and spokes
-        hubs = random.sample(self.major_hubs, k=min(self.num_hubs, len(self.major_hubs)))
+        hubs = [str(h) for h in self.rng.choice(self.major_hubs, size=min(self.num_hubs, len(self.major_hubs)), replace=False)]
         available_spokes = self.regional_banks + [f"Regional Bank {i}" for i in range(max(0, self.num_spokes - len(self.regional_banks)))]
-        spokes = random.sample(available_spokes, k=self.num_spokes)
+        spokes = [str(s) for s in self.rng.choice(available_spokes, size=self.num_spokes, replace=False)]
         
         self.G.add_nodes_from(hubs, type='hub')
         self.G.add_nodes_from(spokes, type='spoke')
         
         # Connect hubs to each other (Systemic Core)
-        for i in range(len(hubs)):
-            for j in range(i + 1, len(hubs)):
-                self.G.add_edge(hubs[i], hubs[j], weight=random.uniform(0.7, 1.0))
+        hub_i, hub_j = np.triu_indices(len(hubs), k=1)
+        core_weights = self.rng.uniform(0.7, 1.0, size=hub_i.size)
+        self.G.add_weighted_edges_from(zip([hubs[i] for i in hub_i], [hubs[j] for j in hub_j], core_weights.tolist()))
         
         # Connect spokes to hubs (Preferential attachment)
-        for spoke in spokes:
-            # Each spoke connects to 1-2 hubs (Interbank exposure)
-            target_hubs = random.sample(hubs, k=random.randint(1, 2))
-            for hub in target_hubs:
-                self.G.add_edge(spoke, hub, weight=random.uniform(0.2, 0.6))
+        # Each spoke connects to 1-2 distinct hubs (Interbank exposure)
+        num_links = self.rng.integers(1, min(2, len(hubs)) + 1, size=len(spokes))
+        first_hub = self.rng.integers(len(hubs), size=len(spokes))
+        second_hub = (first_hub + self.rng.integers(1, max(len(hubs), 2), size=len(spokes))) % len(hubs)
+        spoke_weights = self.rng.uniform(0.2, 0.6, size=(len(spokes), 2)).tolist()
+        
+        spoke_edges = []
+        for k, spoke in enumerate(spokes):
+            spoke_edges.append((spoke, hubs[first_hub[k]], spoke_weights[k][0]))
+            if num_links[k] == 2:
+                spoke_edges.append((spoke, hubs[second_hub[k]], spoke_weights[k][1]))
+        self.G.add_weighted_edges_from(spoke_edges)
 
         # Initial Wealth Distribution
-        wealths = np.random.pareto(1.5, len(hubs) + len(spokes)) + 1
+        wealths = self.rng.pareto(1.5, len(hubs) + len(spokes)) + 1
         wealths = (wealths / np.max(wealths)) * 150000 
-        sorted_wealths = sorted(wealths, reverse=True)
+        sorted_wealths = np.sort(wealths)[::-1]
         
         node_data = {}
         for i, node in enumerate(hubs):
             node_data[node] = {
                 'wealth': sorted_wealths[i],
+                'capital': sorted_wealths[i],
                 'leverage': 1.0,
                 'status': 'healthy',
                 'color': 'green'
@@ -66,27 +100,81 @@ class NetworkManager:
         for i, node in enumerate(spokes):
             node_data[node] = {
                 'wealth': sorted_wealths[len(hubs) + i],
+                'capital': sorted_wealths[len(hubs) + i],
                 'leverage': 1.0,
                 'status': 'healthy',
                 'color': 'green'
             }
         
         nx.set_node_attributes(self.G, node_data)
+        self.topology_version += 1
+        self.state_version += 1
 
     def fail_node(self, node_name):
         """Manually trigger a failure for a specific bank."""
         if node_name in self.G.nodes:
+            if self.G.nodes[node_name]['status'] != 'failed' or self.G.nodes[node_name]['wealth'] != 0:
+                self.state_version += 1
+                self._dirty.add(node_name)
             self.G.nodes[node_name]['status'] = 'failed'
             self.G.nodes[node_name]['wealth'] = 0
             self.G.nodes[node_name]['color'] = 'red'
             return True
         return False
 
-    def update_contagion(self, ccp=None):
+    def apply_wealth_shocks(self, shocks):
+        """
+        Multiplies the wealth of every surviving bank by its shock factor (aligned with G.nodes).
+        """
+        if self._engine is not None and self._engine_topology == self.topology_version:
+            # Same update on the cached engine (synced first), so the next run does not resync every node
+            engine = self._live_engine()
+            survivors = engine.status != FAILED
+            engine.wealth[survivors] *= np.asarray(shocks, dtype=np.float64)[survivors]
+        for node, shock in zip(self.G.nodes(), shocks):
+            if self.G.nodes[node]['status'] != 'failed':
+                self.G.nodes[node]['wealth'] *= shock
+        self.state_version += 1
+
+    def compile_engine(self):
+        """
+        Compiles the current graph into an array-backed ContagionEngine.
+        The engine owns its own wealth/status arrays; call engine.write_back(self.G) to sync.
+        """
+        return ContagionEngine.from_graph(self.G)
+
+    def _live_engine(self):
+        """
+        The cached engine, in sync with G. Compiled from scratch only after a topology
+        change; otherwise only the nodes changed through the dict path or fail_node are
+        reloaded. Array runs write their results straight into it (and back to G for the
+        nodes they touched), so its cost scales with the cascade, not the graph.
+        """
+        if self._engine is None or self._engine_topology != self.topology_version:
+            engine = self.compile_engine()
+            engine.spent[[engine.index[n] for n in self.cascaded if n in engine.index]] = True
+            self._engine, self._engine_topology = engine, self.topology_version
+            self._dirty.clear()
+        elif self._dirty:
+            index = self._engine.index
+            self._engine.sync_from(self.G, [index[n] for n in self._dirty if n in index])
+            self._dirty.clear()
+        return self._engine
+
+    def update_contagion(self, ccp=None, vectorized=False):
         """
         Simulates systemic stress propagation with optional CCP intervention. 
         Returns a list of impacted nodes and the intervention report.
+        vectorized=True runs the round on the array engine and writes the results back to G.
         """
+        if vectorized:
+            engine = self._live_engine()
+            impacted_idx, intervention_report = engine.step(ccp)
+            engine.write_back(self.G, impacted_idx)
+            if impacted_idx.size:
+                self.state_version += 1
+            return [engine.names[i] for i in impacted_idx], intervention_report
+
         impacted = []
         intervention_report = None
         
@@ -127,8 +215,152 @@ class NetworkManager:
                         self.G.nodes[bank]['status'] = 'failed'
                         self.G.nodes[bank]['color'] = 'red'
         
+        if impacted:
+            self.state_version += 1
+            self._dirty.update(impacted)
         return list(set(impacted)), intervention_report
 
+    def run_cascade(self, ccp=None, max_waves=None):
+        """
+        Runs the contagion to a fixpoint in one call, propagating each failure only once.
+        Returns per-wave statistics plus the impacted bank names and the last CCP report.
+        """
+        engine = self._live_engine()
+        spent_before = engine.spent.copy()
+
+        result = engine.run_cascade(ccp, max_waves=max_waves)
+        engine.write_back(self.G, result['impacted'])
+        if result['impacted'].size:
+            self.state_version += 1
+        self.cascaded.update(engine.names[i] for i in np.flatnonzero(engine.spent & ~spent_before))
+
+        result['impacted'] = [engine.names[i] for i in result['impacted']]
+        result['pending'] = [engine.names[i] for i in result['pending']]
+        return result
+
+    def clearing_vector(self, exposure_ratio=0.5, method="fictitious_default", **kwargs):
+        """
+        Solves for Eisenberg-Noe / Rogers-Veraart clearing payments on the current graph.
+        Pass alpha/beta < 1 for default costs; see ClearingSolver for the liability model.
+        """
+        solver = ClearingSolver.from_graph(self.G, exposure_ratio=exposure_ratio, **kwargs)
+        result = solver.solve(method=method)
+        result['names'] = solver.names
+        result['defaulted_banks'] = [solver.names[i] for i in np.flatnonzero(result['defaulted'])]
+        return result
+
+    def what_if(self, candidates='hubs', ccp=None, max_workers=1):
+        """
+        Ranks candidate initial failures by the damage of their full cascade without touching G.
+        candidates is 'hubs', 'all' or a list of bank names. Returns a DataFrame ranked by total loss.
+        """
+        if candidates == 'hubs':
+            candidates = [n for n, d in self.G.nodes(data=True) if d['type'] == 'hub']
+        elif candidates == 'all':
+            candidates = None
+        return FailureSweep(self._live_engine(), ccp=ccp, max_workers=max_workers).run(candidates)
+
+    def _edge_arrays(self):
+        """
+        Edge list in an order that, replayed through add_edge, reproduces every node's
+        neighbour order (which decides CCP allotment order in the contagion engines).
+        Edges are topologically sorted by their position in each endpoint's adjacency;
+        the result only depends on topology, so it is cached per topology_version.
+        """
+        if self._edge_cache is not None and self._edge_cache[0] == self.topology_version:
+            return self._edge_cache[1]
+
+        index = {name: i for i, name in enumerate(self.G.nodes)}
+        edge_id = {}
+        after = [] # after[e] = edges that must be added after e
+        blockers = []
+        for u, nbrs in self.G.adj.items():
+            previous = None
+            for v in nbrs:
+                key = (u, v) if index[u] < index[v] else (v, u)
+                if key not in edge_id:
+                    edge_id[key] = len(after)
+                    after.append([])
+                    blockers.append(0)
+                e = edge_id[key]
+                if previous is not None:
+                    after[previous].append(e)
+                    blockers[e] += 1
+                previous = e
+
+        keys = list(edge_id)
+        ready = deque(e for e in range(len(keys)) if blockers[e] == 0)
+        order = []
+        while ready:
+            e = ready.popleft()
+            order.append(e)
+            for nxt in after[e]:
+                blockers[nxt] -= 1
+                if blockers[nxt] == 0:
+                    ready.append(nxt)
+
+        arrays = {
+            'edge_u': np.array([index[keys[e][0]] for e in order], dtype=np.int32),
+            'edge_v': np.array([index[keys[e][1]] for e in order], dtype=np.int32),
+            'edge_weight': np.array([self.G.edges[keys[e]]['weight'] for e in order], dtype=np.float64)
+        }
+        self._edge_cache = (self.topology_version, arrays)
+        return arrays
+
+    def to_arrays(self):
+        """
+        Columnar copy of the full simulation state (nodes, edges, cascade bookkeeping, RNG).
+        See src/snapshot.py for the on-disk format.
+        """
+        nodes = list(self.G.nodes)
+        data = [self.G.nodes[n] for n in nodes]
+        codes = {'healthy': HEALTHY, 'stressed': STRESSED, 'failed': FAILED}
+        arrays = {
+            'params': np.array([self.num_hubs, self.num_spokes]),
+            'rng_state': np.array(json.dumps(self.rng.bit_generator.state)),
+            'names': np.array(nodes, dtype=str),
+            'is_hub': np.array([d['type'] == 'hub' for d in data], dtype=bool),
+            'wealth': np.array([d['wealth'] for d in data], dtype=np.float64),
+            'capital': np.array([d.get('capital', d['wealth']) for d in data], dtype=np.float64),
+            'leverage': np.array([d['leverage'] for d in data], dtype=np.float64),
+            'status': np.array([codes[d['status']] for d in data], dtype=np.int8),
+            'cascaded': np.array([n in self.cascaded for n in nodes], dtype=bool)
+        }
+        arrays.update(self._edge_arrays())
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuilds a NetworkManager (graph, cascade state and RNG stream) from to_arrays() output."""
+        num_hubs, num_spokes = (int(x) for x in arrays['params'])
+        nm = cls(num_hubs=num_hubs, num_spokes=num_spokes, build=False)
+        nm.rng.bit_generator.state = json.loads(str(arrays['rng_state']))
+
+        names = arrays['names'].tolist()
+        status = arrays['status']
+        nm.G.add_nodes_from(
+            (name, {
+                'type': 'hub' if is_hub else 'spoke',
+                'wealth': wealth,
+                'capital': capital,
+                'leverage': leverage,
+                'status': STATUS_NAMES[code],
+                'color': STATUS_COLORS[code]
+            })
+            for name, is_hub, wealth, capital, leverage, code in zip(
+                names, arrays['is_hub'].tolist(), arrays['wealth'].tolist(),
+                arrays['capital'].tolist(), arrays['leverage'].tolist(), status.tolist()
+            )
+        )
+        nm.G.add_weighted_edges_from(
+            (names[u], names[v], w)
+            for u, v, w in zip(arrays['edge_u'].tolist(), arrays['edge_v'].tolist(), arrays['edge_weight'].tolist())
+        )
+        nm.cascaded = {names[i] for i in np.flatnonzero(arrays['cascaded'])}
+        nm.topology_version += 1
+        nm.state_version += 1
+        return nm
+
     def get_graph_data(self):
         return self.G
 
@@ -1,18 +1,120 @@
 import os
+import re
+import json
+import time
+import random
+import asyncio
 import requests
+import httpx
+import numpy as np
 from dotenv import load_dotenv
 import logging
 
+from src.classification_cache import ClassificationCache
+from src.keyword_matcher import KeywordMatcher
+from src.local_classifier import LocalClassifier
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING) # One INFO line per request would drown the batch logs
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+PROMPT_VERSION = 1 # Bump when the classification prompt changes, so cached verdicts are not reused
+VERDICT_KEYS = ('classification', 'reasoning', 'health_score')
+
+
+def validate_verdict(verdict):
+    """
+    The verdict reduced to VERDICT_KEYS if every key is present with a usable value
+    (non-empty classification, string reasoning, health_score a number from 1 to 10),
+    else None. Only validated verdicts may be cached.
+    """
+    if not isinstance(verdict, dict) or not all(key in verdict for key in VERDICT_KEYS):
+        return None
+    classification, reasoning, health_score = (verdict[key] for key in VERDICT_KEYS)
+    if not isinstance(classification, str) or not classification.strip() or not isinstance(reasoning, str):
+        return None
+    if isinstance(health_score, bool) or not isinstance(health_score, (int, float)) or not 1 <= health_score <= 10:
+        return None
+    return {'classification': classification, 'reasoning': reasoning, 'health_score': int(round(health_score))}
+
+
+class JSONObjectStream:
+    """
+    Incremental parser for a streamed JSON array of objects.
+    feed() takes text chunks as they arrive and returns every top-level object completed
+    so far. Anything outside objects (brackets, commas, code fences, prose) is skipped, and
+    an object that fails to decode is dropped on its own, so one malformed or truncated
+    entry never loses the rest of the array.
+    """
 
-class NewsAnalyzer:
     def __init__(self):
+        self.buffer = ""
+        self.failed = 0
+        self._pos = 0
+        self._start = None # Offset of the '{' opening the current top-level object
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        objects = []
+        buffer = self.buffer
+        for pos in range(self._pos, len(buffer)):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = self._start is not None
+            elif char == '{':
+                if self._depth == 0:
+                    self._start = pos
+                self._depth += 1
+            elif char == '}' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        objects.append(json.loads(buffer[self._start:pos + 1]))
+                    except json.JSONDecodeError:
+                        self.failed += 1
+                    self._start = None
+        self._pos = len(buffer)
+        if self._start is None:
+            # Nothing open: drop the consumed text so the buffer stays small
+            self.buffer, self._pos = "", 0
+        return objects
+
+
+class NewsAnalyzer:
+    def __init__(self, timeout=20.0, max_retries=3, concurrency=8, batch_size=10,
+                 cache_path=os.path.join(".cache", "classifications.sqlite"), lexicon_path=os.getenv("NEWS_LEXICON"),
+                 local_threshold=0.9):
         self.news_api_key = os.getenv("NEWS_API_KEY")
         self.featherless_api_key = os.getenv("FEATHERLESS_API_KEY")
         self.featherless_base_url = os.getenv("FEATHERLESS_API_BASE", "https://api.featherless.ai/v1")
+        self.model = "meta-llama/Meta-Llama-3.1-70B-Instruct"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.concurrency = concurrency
+        self.batch_size = batch_size # Headlines per chat completion in analyze_many; 1 sends one prompt each
+        self.session = requests.Session() # Keep-alive connection pool for the blocking path
+        self._cooldown_until = 0.0 # Shared back-off after a rate-limit response
+        self.cache = ClassificationCache(cache_path) # Model verdicts only; fallbacks are never cached
+        self.matcher = KeywordMatcher.from_file(lexicon_path) if lexicon_path else KeywordMatcher()
+
+        # Local first tier: answers headlines it is at least local_threshold sure of; None disables it
+        self.local = LocalClassifier(threshold=local_threshold if local_threshold is not None else np.inf)
+        self.tier_stats = {'local': 0, 'escalated': 0, 'local_seconds': 0.0, 'llm_headlines': 0, 'llm_seconds': 0.0}
+        if local_threshold is not None:
+            self.train_local_classifier()
 
     def fetch_headlines(self, query="finance banking economy"):
         """
@@ -29,7 +131,7 @@ class NewsAnalyzer:
 
         url = f"https://newsapi.org/v2/everything?q={query}&sortBy=publishedAt&apiKey={self.news_api_key}&language=en"
         try:
-            response = requests.get(url)
+            response = self.session.get(url, timeout=self.timeout)
             data = response.json()
             if data['status'] == 'ok':
                 return [article['title'] for article in data['articles'][:10]]
@@ -44,43 +146,15 @@ class NewsAnalyzer:
         """
         Keyword-based sentiment analysis as a fallback for AI.
         """
-        systemic_keywords = ['collapse', 'crisis', 'loss', 'subprime', 'default', 'warning', 'bankrupt', 'contagion', 'crash']
-        headline_lower = headline.lower()
-        
-        if any(word in headline_lower for word in systemic_keywords):
-            return {
-                "classification": "Systemic Warning",
-                "reasoning": "Fallback: Detected high-risk keywords in headline.",
-                "health_score": 2
-            }
-        
-        # Check for stock splits or neutral events
-        if 'split' in headline_lower or 'dividend' in headline_lower:
-            return {
-                "classification": "Idiosyncratic/Neutral",
-                "reasoning": "Fallback: Detected neutral corporate action (split/dividend).",
-                "health_score": 8
-            }
-            
-        return {
-            "classification": "Neutral",
-            "reasoning": "Fallback: Headline appears non-critical.",
-            "health_score": 6
-        }
-
-    def analyze_risk(self, headline):
-        """
-        Uses Featherless AI (Llama-3) to classify the headline.
-        """
-        if not self.featherless_api_key:
-            logger.warning("FEATHERLESS_API_KEY not found. Using fallback.")
-            return self.get_fallback_analysis(headline)
+        return self.matcher.classify(headline)
 
-        headers = {
+    def _headers(self):
+        return {
             "Authorization": f"Bearer {self.featherless_api_key}",
             "Content-Type": "application/json"
         }
-        
+
+    def _payload(self, headline):
         prompt = f"""
         Analyze the following financial headline and determine if it represents a 'Systemic Warning' (risk to the whole market) or an 'Idiosyncratic/Neutral' event (specific to one firm or non-critical like a stock split).
         
@@ -94,37 +168,287 @@ class NewsAnalyzer:
         }}
         """
 
-        payload = {
-            "model": "meta-llama/Meta-Llama-3.1-70B-Instruct",
+        return {
+            "model": self.model,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.1
         }
 
+    def _batch_payload(self, headlines):
+        numbered = "\n".join(f'[{i}] "{headline}"' for i, headline in enumerate(headlines))
+        prompt = f"""
+        Analyze each of the following financial headlines and determine if it represents a 'Systemic Warning' (risk to the whole market) or an 'Idiosyncratic/Neutral' event (specific to one firm or non-critical like a stock split).
+        
+        Headlines:
+        {numbered}
+        
+        Respond ONLY with a JSON array holding one object per headline, in this format:
+        [
+            {{
+                "index": (The number in brackets before the headline),
+                "classification": "Systemic Warning" or "Idiosyncratic/Neutral",
+                "reasoning": "A short sentence explaining why",
+                "health_score": (Integer between 1 and 10, where 1 is total collapse and 10 is perfect health)
+            }}
+        ]
+        """
+
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.1,
+            "max_tokens": 96 * len(headlines) + 64, # Room for every verdict, so the array is not cut short
+            "stream": True
+        }
+
+    def _cache_key(self, headline):
+        return ClassificationCache.key(headline, self.model, PROMPT_VERSION)
+
+    def _parse(self, result, headline):
+        """
+        Extracts the JSON verdict from a /chat/completions response and caches it.
+        Falls back to keywords (uncached) when the response has no valid verdict.
+        """
+        if 'choices' not in result:
+            error_msg = result.get('error', {}).get('message', 'Unknown error')
+            logger.error(f"Featherless AI error: {error_msg}")
+            # Switch to fallback if upgrade required or other API error
+            return self.get_fallback_analysis(headline)
+
+        content = result['choices'][0]['message']['content']
+        match = re.search(r'\{.*\}', content, re.DOTALL)
         try:
-            response = requests.post(f"{self.featherless_base_url}/chat/completions", headers=headers, json=payload)
-            result = response.json()
-            
-            if 'choices' not in result:
-                error_msg = result.get('error', {}).get('message', 'Unknown error')
-                logger.error(f"Featherless AI error: {error_msg}")
-                # Switch to fallback if upgrade required or other API error
-                return self.get_fallback_analysis(headline)
-                
-            content = result['choices'][0]['message']['content']
-            import json
-            import re
-            match = re.search(r'\{.*\}', content, re.DOTALL)
-            if match:
-                return json.loads(match.group(0))
+            verdict = validate_verdict(json.loads(match.group(0))) if match else None
+        except json.JSONDecodeError:
+            verdict = None
+        if verdict is None:
+            logger.warning(f"Featherless AI returned no valid verdict for: {headline}")
             return self.get_fallback_analysis(headline)
+        self.cache.put(self._cache_key(headline), verdict, headline)
+        return verdict
+
+    def _backoff(self, attempt, retry_after=None):
+        """Seconds to wait before retry `attempt`: Retry-After if the server sent one, else full-jitter exponential."""
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+
+    def train_local_classifier(self):
+        """(Re)trains the local tier on the LLM verdicts in the classification cache. Returns the fit report."""
+        pairs = self.cache.labelled()
+        return self.local.fit([headline for headline, _ in pairs], [verdict for _, verdict in pairs])
+
+    def _local_tier(self, headlines):
+        """Local-model verdicts for the headlines it is confident about, None for those to escalate."""
+        start = time.perf_counter()
+        verdicts = self.local.confident(headlines)
+        self.tier_stats['local_seconds'] += time.perf_counter() - start
+        answered = sum(verdict is not None for verdict in verdicts)
+        self.tier_stats['local'] += answered
+        self.tier_stats['escalated'] += len(headlines) - answered
+        return verdicts
+
+    def tier_report(self):
+        """How many headlines the local tier answered vs escalated, and the LLM time that saved."""
+        stats = self.tier_stats
+        total = stats['local'] + stats['escalated']
+        local_latency = stats['local_seconds'] / total if total else 0.0
+        llm_latency = stats['llm_seconds'] / stats['llm_headlines'] if stats['llm_headlines'] else 0.0
+        return {
+            'local': stats['local'],
+            'escalated': stats['escalated'],
+            'escalation_rate': stats['escalated'] / total if total else 0.0,
+            'local_latency_ms': local_latency * 1000,
+            'llm_latency_ms': llm_latency * 1000,
+            'latency_saved_s': stats['local'] * max(0.0, llm_latency - local_latency)
+        }
+
+    def analyze_risk(self, headline):
+        """
+        Uses Featherless AI (Llama-3) to classify the headline.
+        Repeat headlines are answered from the classification cache, and headlines the
+        local model is confident about never reach the LLM.
+        """
+        cached = validate_verdict(self.cache.get(self._cache_key(headline)))
+        if cached is not None:
+            return cached
+        local = self._local_tier([headline])[0]
+        if local is not None:
+            return local
+        if not self.featherless_api_key:
+            logger.warning("FEATHERLESS_API_KEY not found. Using fallback.")
+            return self.get_fallback_analysis(headline)
+
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries + 1):
+                response = self.session.post(f"{self.featherless_base_url}/chat/completions", headers=self._headers(),
+                                             json=self._payload(headline), timeout=self.timeout)
+                if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    break
+                time.sleep(self._backoff(attempt, response.headers.get('Retry-After')))
+            return self._parse(response.json(), headline)
         except Exception as e:
             logger.error(f"Featherless AI analysis failed: {e}")
             return self.get_fallback_analysis(headline)
+        finally:
+            self.tier_stats['llm_headlines'] += 1
+            self.tier_stats['llm_seconds'] += time.perf_counter() - start
+
+    async def _analyze_async(self, client, semaphore, headline):
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                # Every worker honours a rate-limit pause triggered by any other worker
+                pause = self._cooldown_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                try:
+                    response = await client.post("/chat/completions", json=self._payload(headline))
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"Featherless AI analysis failed: {type(e).__name__} {e}")
+                        return self.get_fallback_analysis(headline)
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+
+                if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                    delay = self._backoff(attempt, response.headers.get('Retry-After'))
+                    if response.status_code == 429:
+                        self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+                    await asyncio.sleep(delay)
+                    continue
+                try:
+                    return self._parse(response.json(), headline)
+                except Exception as e:
+                    logger.error(f"Featherless AI analysis failed: {e}")
+                    return self.get_fallback_analysis(headline)
+
+    @staticmethod
+    async def _stream_content(response):
+        """Yields the completion text as it arrives, from an SSE stream or a plain JSON body."""
+        if response.headers.get('content-type', '').startswith('text/event-stream'):
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    return
+                delta = json.loads(data).get('choices', [{}])[0].get('delta', {}).get('content')
+                if delta:
+                    yield delta
+            return
+
+        result = json.loads(await response.aread())
+        if 'choices' not in result:
+            raise ValueError(result.get('error', {}).get('message', 'Unknown error'))
+        yield result['choices'][0]['message']['content']
+
+    async def _analyze_batch_async(self, client, semaphore, headlines):
+        """
+        Classifies several headlines with one streamed chat completion.
+        Verdicts are taken (and cached) as each array entry completes; if the connection
+        drops mid-stream, only the headlines still without a verdict are retried.
+        Returns verdicts in input order, None where the model gave nothing usable.
+        """
+        verdicts = [None] * len(headlines)
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                remaining = [i for i, verdict in enumerate(verdicts) if verdict is None]
+                pause = self._cooldown_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+
+                delay = None
+                parser = JSONObjectStream()
+                try:
+                    payload = self._batch_payload([headlines[i] for i in remaining])
+                    async with client.stream("POST", "/chat/completions", json=payload) as response:
+                        if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                            delay = self._backoff(attempt, response.headers.get('Retry-After'))
+                            if response.status_code == 429:
+                                self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+                        else:
+                            async for chunk in self._stream_content(response):
+                                for item in parser.feed(chunk):
+                                    index = item.get('index') if isinstance(item, dict) else None
+                                    verdict = validate_verdict(item)
+                                    if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < len(remaining) or verdict is None:
+                                        continue # Left as None: falls back, uncached
+                                    verdicts[remaining[index]] = verdict
+                                    headline = headlines[remaining[index]]
+                                    self.cache.put(self._cache_key(headline), verdict, headline)
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"Featherless AI batch failed: {type(e).__name__} {e}")
+                        break
+                    delay = self._backoff(attempt)
+                except Exception as e:
+                    logger.error(f"Featherless AI batch failed: {e}")
+                    break
+
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+
+        missing = sum(verdict is None for verdict in verdicts)
+        if missing:
+            logger.warning(f"Featherless AI batch: {missing} of {len(headlines)} verdicts unusable "
+                           f"({parser.failed} malformed entries), using fallback for those.")
+        return verdicts
+
+    async def analyze_many(self, headlines, concurrency=None, batch_size=None):
+        """
+        Classifies a batch of headlines concurrently over one pooled keep-alive connection set.
+        At most `concurrency` requests are in flight; each has a timeout and is retried with
+        jittered backoff on timeouts, 5xx and 429 (a 429 pauses all workers for Retry-After).
+        Returns results in input order; anything that still fails gets the keyword fallback.
+        Cached headlines are answered locally and duplicates in the batch are sent once;
+        the local model answers the headlines it is confident about and escalates the rest.
+        With batch_size > 1 the new headlines are packed batch_size to a prompt, cutting the
+        number of round-trips by that factor; entries missing from a reply fall back one by one.
+        """
+        headlines = list(headlines)
+        keys = [self._cache_key(h) for h in headlines]
+        results = [validate_verdict(self.cache.get(k)) for k in keys] # Invalid entries written before validation are re-asked
+        pending = {k: h for k, h, r in zip(keys, headlines, results) if r is None} # One request per distinct key
+        local = dict(zip(pending, self._local_tier(list(pending.values()))))
+        results = [r if r is not None or local.get(k) is None else dict(local[k]) for k, r in zip(keys, results)]
+        pending = {k: h for k, h in pending.items() if local[k] is None}
+        if not pending:
+            return results
+        if not self.featherless_api_key:
+            logger.warning("FEATHERLESS_API_KEY not found. Using fallback.")
+            return [r if r is not None else self.get_fallback_analysis(h) for h, r in zip(headlines, results)]
+
+        concurrency = concurrency or self.concurrency
+        batch_size = batch_size or self.batch_size
+        start = time.perf_counter()
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=self.featherless_base_url, headers=self._headers(),
+                                     timeout=self.timeout, limits=limits) as client:
+            semaphore = asyncio.Semaphore(concurrency)
+            if batch_size > 1:
+                texts = list(pending.values())
+                groups = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+                replies = await asyncio.gather(*(self._analyze_batch_async(client, semaphore, group) for group in groups))
+                fresh = [verdict if verdict is not None else self.get_fallback_analysis(headline)
+                         for group, verdicts in zip(groups, replies) for headline, verdict in zip(group, verdicts)]
+            else:
+                groups = pending
+                fresh = await asyncio.gather(*(self._analyze_async(client, semaphore, h) for h in pending.values()))
+        fresh = dict(zip(pending, fresh))
+        self.tier_stats['llm_headlines'] += len(pending)
+        self.tier_stats['llm_seconds'] += time.perf_counter() - start
+        logger.info(f"Classified {len(pending)} new headlines of {len(headlines)} in {len(groups)} requests "
+                    f"in {time.perf_counter() - start:.2f}s.")
+        return [r if r is not None else dict(fresh[k]) for k, r in zip(keys, results)]
 
 if __name__ == "__main__":
     analyzer = NewsAnalyzer()
     headlines = analyzer.fetch_headlines()
-    for h in headlines:
+    for h, analysis in zip(headlines, asyncio.run(analyzer.analyze_many(headlines))):
         print(f"Headline: {h}")
-        analysis = analyzer.analyze_risk(h)
         print(f"Analysis: {analysis}\n")
@@ -0,0 +1,113 @@
+import numpy as np
+import io
+import os
+import json
+import time
+import logging
+
+from src.network_manager import NetworkManager
+from src.ccp import CCP
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+
+
+def save_snapshot(file, network, ccp, round_number=0, rng=None):
+    """
+    Writes NetworkManager + CCP state as an uncompressed .npz: one flat array per column
+    ("network/wealth", "ccp/log_allotment", ...), no pickled objects. file is a path or
+    a binary file object. Pass the app's numpy Generator as rng to store its stream
+    position too, so a restored round replays the same draws.
+    """
+    arrays = {'meta': np.array([SNAPSHOT_VERSION, round_number])}
+    if rng is not None:
+        arrays['app/rng_state'] = np.array(json.dumps(rng.bit_generator.state))
+    arrays.update({f"network/{k}": v for k, v in network.to_arrays().items()})
+    arrays.update({f"ccp/{k}": v for k, v in ccp.to_arrays().items()})
+    np.savez(file, **arrays)
+
+
+def load_snapshot(file, rng=None):
+    """
+    Reads a snapshot written by save_snapshot. Returns (network, ccp, round_number).
+    If rng is given and the snapshot stored an app rng state, rng is rewound to it in place.
+    """
+    with np.load(file, allow_pickle=False) as npz:
+        version, round_number = npz['meta'].tolist()
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {version}")
+        if rng is not None and 'app/rng_state' in npz.files:
+            rng.bit_generator.state = json.loads(str(npz['app/rng_state']))
+        network_arrays = {k.split('/', 1)[1]: npz[k] for k in npz.files if k.startswith('network/')}
+        ccp_arrays = {k.split('/', 1)[1]: npz[k] for k in npz.files if k.startswith('ccp/')}
+    return NetworkManager.from_arrays(network_arrays), CCP.from_arrays(ccp_arrays), round_number
+
+
+class Checkpointer:
+    """
+    Per-round checkpoints of a running simulation, so any round can be replayed or branched.
+    Snapshots are kept in memory as .npz bytes; pass directory to also write them to disk.
+    Retention: only every keep_every-th round is saved, and at most max_checkpoints stay in
+    memory (the oldest are dropped, except the first one so the run can always restart).
+    Evicted rounds remain restorable from directory when one is set.
+    """
+
+    def __init__(self, directory=None, max_checkpoints=None, keep_every=1):
+        self.directory = directory
+        self.max_checkpoints = max_checkpoints
+        self.keep_every = keep_every
+        self.checkpoints = {}
+        self.on_disk = set()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, round_number):
+        return os.path.join(self.directory, f"round_{round_number:05d}.npz")
+
+    def save(self, round_number, network, ccp, rng=None):
+        """Checkpoints a round (if the keep_every policy keeps it). Returns whether it was saved."""
+        if round_number % self.keep_every:
+            return False
+        start = time.perf_counter()
+        buffer = io.BytesIO()
+        save_snapshot(buffer, network, ccp, round_number, rng)
+        self.checkpoints[round_number] = buffer.getvalue()
+        if self.directory:
+            with open(self._path(round_number), 'wb') as f:
+                f.write(self.checkpoints[round_number])
+            self.on_disk.add(round_number)
+        if self.max_checkpoints is not None and len(self.checkpoints) > self.max_checkpoints:
+            rounds = sorted(self.checkpoints)
+            for r in rounds[1:len(rounds) - self.max_checkpoints + 1]:
+                del self.checkpoints[r]
+        logger.debug(f"Checkpoint round {round_number}: {buffer.getbuffer().nbytes} bytes in {(time.perf_counter() - start)*1000:.2f}ms.")
+        return True
+
+    def restore(self, round_number, rng=None):
+        """
+        Returns fresh (network, ccp) objects for a saved round; the checkpoint itself is untouched.
+        A given rng is rewound in place to where it was when the round was saved.
+        """
+        if round_number in self.checkpoints:
+            network, ccp, _ = load_snapshot(io.BytesIO(self.checkpoints[round_number]), rng)
+        elif round_number in self.on_disk:
+            network, ccp, _ = load_snapshot(self._path(round_number), rng)
+        else:
+            raise KeyError(f"No checkpoint for round {round_number}")
+        return network, ccp
+
+    def rounds(self):
+        return sorted(set(self.checkpoints) | self.on_disk)
+
+    def truncate(self, round_number):
+        """Drops checkpoints after round_number (in memory and on disk), e.g. when branching from an earlier round."""
+        for r in [r for r in self.checkpoints if r > round_number]:
+            del self.checkpoints[r]
+        for r in [r for r in self.on_disk if r > round_number]:
+            try:
+                os.remove(self._path(r))
+            except FileNotFoundError:
+                pass
+            self.on_disk.discard(r)
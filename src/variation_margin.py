@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import heapq
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class VariationMarginScheduler:
+    """
+    Event-driven variation margin.
+    Member positions (units per instrument) are held as a CSC matrix so a price move in
+    one instrument touches only the members that hold it: a tick costs O(holders), and a
+    burst of ticks is netted to one price change per instrument and applied as a single
+    sparse product over the moved columns. Ticks only mark the touched members dirty;
+    before calls are read, dirty members whose collateral plus accumulated variation is
+    below their requirement are (re)queued by shortfall, largest first, in a heap with
+    lazy invalidation.
+    """
+
+    def __init__(self, positions, prices, collateral, requirements, members=None, instruments=None, min_transfer=0.0):
+        self.positions = sp.csc_matrix(positions, dtype=np.float64)
+        n_members, n_instruments = self.positions.shape
+        self.prices = np.array(prices, dtype=np.float64)
+        self.collateral = np.array(collateral, dtype=np.float64) * np.ones(n_members)
+        self.requirements = np.array(requirements, dtype=np.float64) * np.ones(n_members)
+        self.variation = np.zeros(n_members) # Accumulated mark-to-market P&L since the last settlement
+        self.members = list(members) if members is not None else list(range(n_members))
+        self.instruments = list(instruments) if instruments is not None else list(range(n_instruments))
+        self.instrument_index = {name: k for k, name in enumerate(self.instruments)}
+        self.min_transfer = min_transfer
+
+        self._queue = []
+        self._call_version = np.zeros(n_members, dtype=np.int64) # Bumped on every re-evaluation; stale heap entries are skipped
+        self._dirty = np.ones(n_members, dtype=bool) # Everyone is evaluated once, so members already short are called
+        self._seq = 0
+        self.ticks = 0
+        self.revaluations = 0 # Member re-evaluations, for comparison with members * ticks
+
+    @classmethod
+    def from_novation(cls, novation, prices, collateral, requirements, **kwargs):
+        """
+        Positions from a NovationEngine: net notional per member and instrument, converted
+        to units at the given reference prices (aligned with novation.instruments).
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        units = novation.positions / prices[np.newaxis, :]
+        return cls(units, prices, collateral, requirements, members=novation.members,
+                   instruments=novation.instruments, **kwargs)
+
+    def _ids(self, instruments):
+        instruments = np.asarray(instruments)
+        if np.issubdtype(instruments.dtype, np.integer):
+            return instruments.astype(np.int64)
+        return np.array([self.instrument_index[name] for name in instruments.tolist()], dtype=np.int64)
+
+    def balance(self):
+        return self.collateral + self.variation
+
+    def shortfall(self, members=None):
+        members = slice(None) if members is None else members
+        return self.requirements[members] - self.collateral[members] - self.variation[members]
+
+    def on_tick(self, instrument, price):
+        """Single price update: revalues only the holders of that instrument."""
+        k = instrument if isinstance(instrument, (int, np.integer)) else self.instrument_index[instrument]
+        change = price - self.prices[k]
+        self.prices[k] = price
+        self.ticks += 1
+        if change == 0:
+            return
+        start, end = self.positions.indptr[k], self.positions.indptr[k + 1]
+        holders = self.positions.indices[start:end]
+        self.variation[holders] += self.positions.data[start:end] * change
+        self._dirty[holders] = True
+
+    def process_ticks(self, instruments, prices):
+        """
+        Burst of ticks in arrival order. Only the last price per instrument matters for the
+        marks, so the burst collapses to one price change per moved instrument.
+        """
+        ids = self._ids(instruments)
+        prices = np.asarray(prices, dtype=np.float64)
+        self.ticks += len(ids)
+        if ids.size == 0:
+            return
+
+        # Last tick per instrument: first occurrence in the reversed burst
+        last_ids, first = np.unique(ids[::-1], return_index=True)
+        last_prices = prices[::-1][first]
+        change = last_prices - self.prices[last_ids]
+        self.prices[last_ids] = last_prices
+        moved = last_ids[change != 0]
+        if moved.size == 0:
+            return
+
+        columns = self.positions[:, moved]
+        self.variation += columns @ change[change != 0]
+        self._dirty[columns.indices] = True
+
+    def _reevaluate(self):
+        """Requeues the calls of members marked since the last read."""
+        members = np.flatnonzero(self._dirty)
+        if members.size == 0:
+            return
+        self._dirty[members] = False
+        self.revaluations += len(members)
+        self._call_version[members] += 1
+        shortfall = self.shortfall(members)
+        calls = shortfall > self.min_transfer
+        for member, amount, version in zip(members[calls].tolist(), shortfall[calls].tolist(),
+                                           self._call_version[members[calls]].tolist()):
+            self._seq += 1
+            heapq.heappush(self._queue, (-amount, self._seq, member, version))
+
+        if len(self._queue) > 4 * len(self.members) + 1024:
+            # Too many stale entries: keep only the live ones
+            self._queue = [entry for entry in self._queue if entry[3] == self._call_version[entry[2]]]
+            heapq.heapify(self._queue)
+
+    def next_call(self):
+        """Pops the outstanding margin call with the largest shortfall, or None."""
+        self._reevaluate()
+        while self._queue:
+            neg_amount, _, member, version = heapq.heappop(self._queue)
+            if version == self._call_version[member]:
+                return {'member': self.members[member], 'index': member, 'amount': -neg_amount}
+        return None
+
+    def pending_calls(self):
+        """Outstanding calls, largest first, without consuming them."""
+        self._reevaluate()
+        live = {}
+        for neg_amount, _, member, version in self._queue:
+            if version == self._call_version[member]:
+                live[member] = -neg_amount
+        return sorted(({'member': self.members[m], 'index': m, 'amount': a} for m, a in live.items()),
+                      key=lambda call: call['amount'], reverse=True)
+
+    def settle(self, member, amount):
+        """Records collateral posted against a call and re-evaluates the member."""
+        index = member if isinstance(member, (int, np.integer)) else self.members.index(member)
+        self.collateral[index] += amount
+        self._dirty[index] = True
+
+    def to_arrays(self):
+        """Columnar state for snapshots; the call queue is rebuilt from the balances on restore."""
+        return {
+            'vm_positions_data': self.positions.data,
+            'vm_positions_indices': self.positions.indices,
+            'vm_positions_indptr': self.positions.indptr,
+            'vm_prices': self.prices,
+            'vm_collateral': self.collateral,
+            'vm_requirements': self.requirements,
+            'vm_variation': self.variation,
+            'vm_members': np.asarray(self.members),
+            'vm_instruments': np.asarray(self.instruments),
+            'vm_params': np.array([self.min_transfer, self.ticks, self.revaluations], dtype=np.float64)
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        members, instruments = arrays['vm_members'].tolist(), arrays['vm_instruments'].tolist()
+        positions = sp.csc_matrix((arrays['vm_positions_data'], arrays['vm_positions_indices'], arrays['vm_positions_indptr']),
+                                  shape=(len(members), len(instruments)))
+        min_transfer, ticks, revaluations = arrays['vm_params'].tolist()
+        scheduler = cls(positions, arrays['vm_prices'], arrays['vm_collateral'], arrays['vm_requirements'],
+                        members=members, instruments=instruments, min_transfer=min_transfer)
+        scheduler.variation = np.array(arrays['vm_variation'], dtype=np.float64)
+        scheduler.ticks, scheduler.revaluations = int(ticks), int(revaluations)
+        return scheduler
+
+    def consume(self, ticks, burst_size=10_000):
+        """
+        Drains an iterable of (instrument, price) ticks, e.g. a live feed or a replayed file,
+        in bursts of burst_size.
+        """
+        start = time.perf_counter()
+        instruments, prices = [], []
+        for instrument, price in ticks:
+            instruments.append(instrument)
+            prices.append(price)
+            if len(prices) >= burst_size:
+                self.process_ticks(instruments, prices)
+                instruments, prices = [], []
+        if prices:
+            self.process_ticks(instruments, prices)
+        pending = len(self.pending_calls())
+        logger.info(f"Variation margin: {self.ticks} ticks, {self.revaluations} member revaluations, "
+                    f"{pending} calls pending ({(time.perf_counter() - start)*1000:.1f}ms).")
+
+    def replay(self, prices):
+        """
+        Replays a (dates x instruments) close-price table (see DataEngine.get_close_prices)
+        bar by bar. Columns are matched to instruments by name.
+        """
+        if isinstance(prices, pd.DataFrame):
+            ids = self._ids(list(prices.columns))
+            prices = prices.to_numpy(dtype=np.float64)
+        else:
+            ids = np.arange(np.shape(prices)[1])
+        for bar in np.asarray(prices, dtype=np.float64):
+            valid = ~np.isnan(bar)
+            self.process_ticks(ids[valid], bar[valid])
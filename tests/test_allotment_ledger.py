@@ -0,0 +1,31 @@
+import numpy as np
+
+from src.allotment_ledger import AllotmentLedger
+
+
+def _events(ledger, start, n):
+    ledger.extend('F', [f"T{i}" for i in range(start, start + n)], np.arange(start, start + n, dtype=float),
+                  ['Fully Protected'] * n)
+
+
+def test_spill_when_batch_crosses_capacity(tmp_path):
+    ledger = AllotmentLedger(capacity=10, spill_dir=str(tmp_path), spill_block=1)
+    _events(ledger, 0, 5)
+    _events(ledger, 5, 8) # 5 retained + 8 new: the three oldest are evicted inside this batch
+    ledger.flush()
+
+    spilled = AllotmentLedger.read_spill(str(tmp_path))
+    assert [(e['target_bank'], e['allotment']) for e in spilled] == [('T0', 0.0), ('T1', 1.0), ('T2', 2.0)]
+    assert [e['target_bank'] for e in ledger.tail(10)] == [f"T{i}" for i in range(3, 13)]
+
+
+def test_spill_keeps_every_event_in_order(tmp_path):
+    ledger = AllotmentLedger(capacity=7, spill_dir=str(tmp_path), spill_block=1)
+    start = 0
+    for n in (3, 6, 1, 9, 4, 7, 15, 2):
+        _events(ledger, start, n)
+        start += n
+    ledger.flush()
+
+    events = AllotmentLedger.read_spill(str(tmp_path)) + ledger.tail(ledger.filled)
+    assert [e['allotment'] for e in events] == list(np.arange(start, dtype=float))
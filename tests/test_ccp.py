@@ -0,0 +1,29 @@
+import numpy as np
+
+from src.ccp import CCP
+
+
+def _ccp():
+    ccp = CCP()
+    ccp.cash_waterfall = 10.0
+    ccp.setup_waterfall(['A', 'B', 'C'], [1.0, 1.0, 1.0], [5.0, 5.0, 5.0])
+    ccp.perform_novation(buyers=['A', 'B'], sellers=['B', 'C'], notionals=[10.0, 20.0], instruments=['IRS', 'IRS'])
+    return ccp
+
+
+def test_fork_isolates_cascade_state():
+    ccp = _ccp()
+    case = ccp.fork()
+    case.process_failures_array('A', ['B', 'C'], np.array([20.0, 20.0]))
+
+    assert case.waterfall.df[1:].sum() < 10.0 and case.cash_waterfall == 0.0
+    assert ccp.waterfall.df.tolist() == [5.0, 5.0, 5.0] and ccp.cash_waterfall == 10.0
+    assert not ccp.waterfall.defaulted.any() and ccp.waterfall.charged.sum() == 0.0
+    assert len(ccp.allotment_log) == 0 and len(case.allotment_log) > 0
+
+
+def test_fork_shares_book_read_only():
+    ccp = _ccp()
+    case = ccp.fork()
+    assert case.novation is ccp.novation
+    assert case.waterfall.members is ccp.waterfall.members
@@ -0,0 +1,22 @@
+import numpy as np
+import scipy.sparse as sp
+
+from src.debtrank import DebtRank
+
+
+def test_failed_bank_does_not_pass_on_distress_again():
+    # W[i, j]: impact of i on j. C hits A, A hits B; A has already failed.
+    impact = sp.csr_matrix(np.array([[0.0, 1.0, 0.0],
+                                     [0.0, 0.0, 0.0],
+                                     [1.0, 0.0, 0.0]]))
+    value = np.array([0.0, 0.5, 0.5])
+    healthy = DebtRank(impact, value, names=['A', 'B', 'C'])
+    failed = DebtRank(impact, value, names=['A', 'B', 'C'], failed=[True, False, False])
+
+    assert healthy.scores()['C'] == 0.5 # Through A to B
+    scores = failed.scores()
+    assert scores['C'] == 0.0
+    assert scores['A'] == 0.0
+
+    H, _ = failed.propagate(np.zeros((3, 1)))
+    assert np.array_equal(H[:, 0], [1.0, 0.0, 0.0])
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from src.default_waterfall import DefaultWaterfall
+
+
+@pytest.fixture
+def waterfall():
+    return DefaultWaterfall(['A', 'B', 'C', 'D'], initial_margin=[10, 10, 10, 10], default_fund=[5, 5, 5, 5], sitg=20)
+
+
+def test_layers_are_used_in_order(waterfall):
+    report = waterfall.allocate(waterfall.member_index(['A']), [50.0])
+    assert report['totals'] == {'defaulter_im': 10.0, 'defaulter_df': 5.0, 'ccp_sitg': 20.0,
+                                'survivor_df': 15.0, 'assessments': 0.0}
+    assert np.allclose(report['df_charges'], [0, 5, 5, 5])
+    assert np.allclose(report['uncovered'], 0)
+
+
+def test_survivor_charges_debit_member_balances(waterfall):
+    # Survivor layers are real debits: a loss beyond IM, DF and SITG lowers the survivors' balances
+    before = waterfall.member_balances()
+    report = waterfall.allocate(waterfall.member_index(['A']), [50.0])
+    waterfall.charge_members(report['df_charges'], report['assessment_charges'])
+    after = waterfall.member_balances()
+    survivors = np.arange(1, 4)
+    assert np.allclose(after['default_fund'][survivors], before['default_fund'][survivors] - 5)
+    assert np.allclose(after['assessed'][survivors], 0)
+
+    report = waterfall.allocate(waterfall.member_index(['B']), [40.0]) # Beyond the remaining DF: assessments
+    waterfall.charge_members(report['df_charges'], report['assessment_charges'])
+    after = waterfall.member_balances()
+    assert np.allclose(after['charged'][[2, 3]], 10)
+    assert np.allclose(after['assessed'][[2, 3]], 5)
+
+
+def test_duplicate_defaulters_share_own_resources(waterfall):
+    report = waterfall.allocate(waterfall.member_index(['A', 'A']), [6.0, 12.0])
+    assert np.allclose(report['layers']['defaulter_im'], [10 / 3, 20 / 3])
+    assert np.allclose(report['layers']['defaulter_df'], [5 / 3, 10 / 3])
+    assert np.allclose(report['layers']['ccp_sitg'], [1.0, 2.0])
+
+
+def test_exhausted_waterfall_reports_uncovered_loss(waterfall):
+    report = waterfall.allocate(waterfall.member_index(['X']), [100.0]) # Not a clearing member
+    assert report['totals']['defaulter_im'] == 0
+    assert np.isclose(report['totals']['assessments'], 20.0)
+    assert np.allclose(report['uncovered'], 100.0 - 20 - 20 - 20)
@@ -0,0 +1,22 @@
+import numpy as np
+
+from src.keyword_matcher import KeywordMatcher
+
+
+def test_matches_stay_on_their_headline_when_lower_changes_length():
+    matcher = KeywordMatcher()
+    headlines = ["İstanbul bank İİİİİİİİİİ reports", "crisis", "calm markets"]
+    assert matcher.classify_many(headlines).tolist() == [6, 2, 6]
+
+
+def test_word_boundaries_and_inflections():
+    matcher = KeywordMatcher()
+    health = matcher.classify_many(["Glossy quarterly report", "Bank losses mount", "2-for-1 stock split", ""])
+    assert health.tolist() == [6, 2, 8, 6]
+
+
+def test_classify_matches_classify_many():
+    matcher = KeywordMatcher()
+    headlines = ["Lehman Brothers reports $3B loss in subprime.", "Dividend raised", "Global markets rally"]
+    assert [matcher.classify(h)['health_score'] for h in headlines] == matcher.classify_many(headlines).tolist()
+    assert np.asarray(matcher.classify_many([])).size == 0
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src.margin_model import MarginModel
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(0)
+    return 100 * np.cumprod(1 + rng.normal(0, 0.01, size=(101, 2)), axis=0)
+
+
+@pytest.mark.parametrize('confidence, expected', [(0.99, 1), (0.975, 3), (0.95, 5), (0.9, 10)])
+def test_var_and_es_use_pinned_tail_counts(prices, confidence, expected):
+    # 1% of 100 scenarios is exactly the worst one, 5% the worst five
+    model = MarginModel(window=100, confidence=confidence).fit(prices)
+    losses = np.sort(-model.scenario_pnl([1.0, 0.0]))
+    assert model.tail_size == expected
+    assert np.isclose(model.initial_margin([1.0, 0.0], 'var'), losses[-expected])
+    assert np.isclose(model.initial_margin([1.0, 0.0], 'es'), losses[-expected:].mean())
+
+
+def test_book_is_margined_row_by_row(prices):
+    model = MarginModel(window=100).fit(prices)
+    book = np.array([[1.0, 0.0], [-2.0, 1.0], [0.5, 0.5]])
+    for method in ('var', 'es', 'span'):
+        expected = [model.initial_margin(row, method) for row in book]
+        assert np.allclose(model.initial_margin(book, method), expected)
+
+
+def test_span_charges_the_full_scan_range(prices):
+    model = MarginModel(window=100, scan_sigmas=3.0).fit(prices)
+    volatility = np.diff(prices, axis=0) / prices[:-1]
+    assert np.isclose(model.initial_margin([2.0, 0.0], 'span'), 2.0 * 3.0 * volatility[:, 0].std())
+    assert np.isclose(model.initial_margin([0.0, -1.0], 'span'), 3.0 * volatility[:, 1].std())
+
+
+def test_missing_price_is_carried_forward(prices):
+    # A gap's move lands on the bar where trading resumes instead of becoming a 0% return
+    gappy = prices.copy()
+    gappy[50, 0] = np.nan
+    model = MarginModel(window=100).fit(gappy)
+    assert model.filled == 100
+    assert np.isclose(np.prod(1 + model.historical_scenarios[:, 0]), prices[-1, 0] / prices[0, 0])
+
+
+def test_append_bar_matches_refit(prices):
+    model = MarginModel(window=50).fit(prices[:-10])
+    for bar in prices[-10:]:
+        model.append_bar(bar)
+    refit = MarginModel(window=50).fit(prices)
+    assert np.allclose(np.sort(model.historical_scenarios, axis=0), np.sort(refit.historical_scenarios, axis=0))
+    assert np.allclose(model.volatility, refit.volatility)
+    assert np.isclose(model.initial_margin([1.0, -1.0], 'span'), refit.initial_margin([1.0, -1.0], 'span'))
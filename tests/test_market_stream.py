@@ -0,0 +1,16 @@
+import numpy as np
+
+from src.data_engine import RollingVolatility
+from src.market_stream import volatility_subscriber
+
+
+def test_volatility_subscriber_reindexes_by_ticker():
+    tracker = RollingVolatility(np.zeros((0, 2)), [100.0, 200.0], window=3, tickers=['A', 'B'])
+    on_bars = volatility_subscriber(tracker)
+    on_bars({'timestamps': np.array([0]), 'tickers': ['B', 'A', 'C'], 'close': np.array([[220.0, 101.0, 5.0]])})
+    assert np.allclose(tracker.last_price, [101.0, 220.0])
+    assert np.allclose(tracker.buffer[0], [0.01, 0.1])
+
+    on_bars({'timestamps': np.array([1]), 'tickers': ['A'], 'close': np.array([[102.0]])})
+    assert tracker.last_price[0] == 102.0
+    assert np.isnan(tracker.last_price[1])
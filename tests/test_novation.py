@@ -0,0 +1,17 @@
+import numpy as np
+
+from src.novation import NovationEngine
+
+
+def test_close_ignores_duplicate_and_closed_ids():
+    engine = NovationEngine()
+    ids = engine.novate(['A', 'B'], ['B', 'C'], [10.0, 20.0], ['IRS', 'IRS'])['trade_ids']
+
+    assert engine.close([ids[0], ids[0]]) == 1
+    assert np.allclose(engine.positions[:, 0], [0.0, 20.0, -20.0])
+    assert np.allclose(engine.gross, [0.0, 20.0, 20.0])
+
+    assert engine.close([ids[0], ids[1]]) == 1
+    assert np.allclose(engine.positions, 0.0)
+    assert np.allclose(engine.gross, 0.0)
+    assert engine.open_legs == 0
@@ -0,0 +1,42 @@
+import io
+import logging
+
+import numpy as np
+
+from src.ccp import CCP
+from src.margin_model import MarginModel
+from src.network_manager import NetworkManager
+from src.snapshot import load_snapshot, save_snapshot
+
+
+def test_snapshot_keeps_variation_margin_and_margin_model():
+    logging.disable(logging.INFO)
+    rng = np.random.default_rng(0)
+    ccp = CCP()
+    ccp.perform_novation(buyers=['A', 'B', 'C'], sellers=['B', 'C', 'A'], notionals=[100.0, 50.0, 20.0],
+                         instruments=['X', 'Y', 'X'])
+    ccp.setup_variation_margin(prices=[10.0, 20.0], collateral=[1.0, 1.0, 1.0])
+    ccp.variation_margin.process_ticks(['X', 'Y'], [9.5, 21.0])
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, size=(60, 2)), axis=0)
+    ccp.set_margin_model(MarginModel(window=40).fit(prices, tickers=['X', 'Y']))
+
+    buffer = io.BytesIO()
+    save_snapshot(buffer, NetworkManager(seed=1), ccp)
+    buffer.seek(0)
+    _, restored, _ = load_snapshot(buffer)
+
+    vm, restored_vm = ccp.variation_margin, restored.variation_margin
+    assert restored_vm is not None
+    assert np.allclose(restored_vm.variation, vm.variation)
+    assert restored_vm.pending_calls() == vm.pending_calls()
+    restored_vm.process_ticks(['X'], [9.0])
+    vm.process_ticks(['X'], [9.0])
+    assert restored_vm.pending_calls() == vm.pending_calls()
+
+    exposures = np.array([[1.0, -2.0], [3.0, 0.5]])
+    for method in ('var', 'es', 'span'):
+        assert np.allclose(restored.margin_model.initial_margin(exposures, method), ccp.margin_model.initial_margin(exposures, method))
+    restored.margin_model.append_bar(prices[-1] * 1.01)
+    ccp.margin_model.append_bar(prices[-1] * 1.01)
+    assert np.allclose(restored.margin_model.initial_margin(exposures), ccp.margin_model.initial_margin(exposures))
+    logging.disable(logging.NOTSET)
@@ -0,0 +1,22 @@
+import numpy as np
+
+from src.variation_margin import VariationMarginScheduler
+
+
+def test_initial_shortfall_is_called_without_a_tick():
+    scheduler = VariationMarginScheduler(np.array([[10.0, 0.0], [0.0, 5.0]]), prices=[100.0, 50.0],
+                                         collateral=[50.0, 500.0], requirements=[100.0, 100.0], members=['A', 'B'])
+    calls = scheduler.pending_calls()
+    assert [(call['member'], call['amount']) for call in calls] == [('A', 50.0)]
+    assert scheduler.next_call()['member'] == 'A'
+    assert scheduler.next_call() is None
+
+
+def test_tick_moves_call_by_position():
+    scheduler = VariationMarginScheduler(np.array([[10.0], [-4.0]]), prices=[100.0],
+                                         collateral=[100.0, 100.0], requirements=[100.0, 100.0], members=['A', 'B'])
+    assert scheduler.pending_calls() == []
+    scheduler.on_tick(0, 98.0) # A loses 20, B gains 8
+    assert [(call['member'], call['amount']) for call in scheduler.pending_calls()] == [('A', 20.0)]
+    scheduler.settle('A', 20.0)
+    assert scheduler.pending_calls() == []